@@ -0,0 +1,26 @@
+import json
+import sys
+
+from providers import data_provider
+from processors import bulk_processor
+from processors import import_processor
+
+# Imports an NDJSON file (or stdin with "-") straight into a pool's data
+# files. Stop the server first, it would not see the new records. Run it
+# from the PythonAPI folder like the server:
+#     python api/import_ndjson.py <resource> <file>
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in bulk_processor.RESOURCES:
+        print(f"usage: import_ndjson.py <{'|'.join(bulk_processor.RESOURCES)}> <file|->")
+        sys.exit(2)
+    data_provider.LOAD_MODE = "lazy"
+    data_provider.init()
+    if sys.argv[2] == "-":
+        stream = sys.stdin.buffer
+    else:
+        stream = open(sys.argv[2], "rb")
+    report = import_processor.import_lines(sys.argv[1], import_processor.read_lines(stream))
+    stream.close()
+    print(json.dumps(report, indent=4))
+    sys.exit(1 if report["failed"] else 0)
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import tracemalloc
+
+from providers import data_provider
+from providers import json_provider
+from storage import snapshot
+
+# Compares pool warm-up times (and peak traced allocations) on the data set
+# in ROOT_PATH. Run it from the PythonAPI folder like the server:
+#     python api/load_benchmark.py [rounds]
+
+MODES = [
+    ("serial, json", "eager", "json", False),
+    ("serial, orjson", "eager", "orjson", False),
+    ("parallel, json", "parallel", "json", False),
+    ("parallel, orjson", "parallel", "orjson", False),
+    ("snapshot", "eager", "json", True),
+]
+
+
+def run(mode, decoder, snapshots):
+    data_provider.LOAD_MODE = mode
+    json_provider.JSON_DECODER = decoder
+    snapshot.ENABLED = snapshots
+    start = time.perf_counter()
+    data_provider.init()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = []
+    for label, mode, decoder, snapshots in MODES:
+        if decoder == "orjson" and json_provider.orjson is None:
+            continue
+        # The warm-up prints per pool timings; only the totals matter here.
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        if snapshots:
+            # Makes sure the snapshots exist before timing.
+            run(mode, decoder, snapshots)
+        times = []
+        for i in range(rounds):
+            times.append(run(mode, decoder, snapshots))
+        tracemalloc.start()
+        run(mode, decoder, snapshots)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        sys.stdout.close()
+        sys.stdout = stdout
+        results.append((label, min(times), sum(times) / len(times), peak))
+    print(f"{'mode':<20}{'best ms':>10}{'mean ms':>10}{'peak MB':>10}   ({data_provider.LOAD_WORKERS} workers, {rounds} rounds)")
+    for label, best, mean, peak in results:
+        print(f"{label:<20}{best * 1000:>10.1f}{mean * 1000:>10.1f}{peak / 1024 / 1024:>10.1f}")
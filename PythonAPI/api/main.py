@@ -1,44 +1,371 @@
+import socket
 import socketserver
 import http.server
 import json
+import io
+import os
+import urllib.parse
+import email.utils
+from datetime import timezone
 
 from providers import auth_provider
 from providers import data_provider
+from providers import cache_provider
+from providers import changes_provider
+from providers import search_provider
 
+from processors import bulk_processor
+from processors import event_processor
+from processors import import_processor
 from processors import notification_processor
+from processors import query_processor
+from processors import transfer_processor
+
+from models.base import InvalidKey
+
+from servers.thread_pool_server import ThreadPoolServer
+from servers import event_writer
+from servers.async_server import AsyncServer, ResponseWriter
+
+SERVER_MODE = os.environ.get("SERVER_MODE", "threaded")
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", "8"))
+SERVER_QUEUE_SIZE = int(os.environ.get("SERVER_QUEUE_SIZE", "64"))
+
+STREAM_BATCH_SIZE = 500
 
 
 class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
 
+    def handle_write(self, handler, path, user):
+        if data_provider.is_read_only(path[0]):
+            self.send_response(405)
+            self.send_header("Allow", "GET")
+            self.end_headers()
+            return
+        # Read the body before taking the write lock so a slow client
+        # doesn't stall every other request while it uploads.
+        stream = self.rfile
+        content_length = self.headers.get("Content-Length")
+        if content_length is not None:
+            self.rfile = io.BytesIO(stream.read(int(content_length)))
+        try:
+            with data_provider.write_lock():
+                handler(path, user)
+        except InvalidKey as e:
+            self.send_result(400, {"error": str(e)})
+        finally:
+            self.rfile = stream
+
+    def commit_transfers(self, transfer_ids):
+        missing = transfer_processor.find_missing(transfer_ids)
+        if missing:
+            # Nothing is applied unless every transfer in the batch exists.
+            self.send_result(404, {"missing": missing})
+            return
+        transfer_processor.commit_transfers(transfer_ids)
+        self.send_response(200)
+        self.end_headers()
+
+    def handle_bulk(self, resource, method):
+        content_length = int(self.headers["Content-Length"])
+        try:
+            records = bulk_processor.parse_body(self.rfile.read(content_length))
+        except ValueError as e:
+            self.send_result(400, {"error": f"invalid JSON: {e}"})
+            return
+        if not isinstance(records, list):
+            self.send_result(400, {"error": "expected a JSON array or NDJSON"})
+            return
+        results = bulk_processor.apply(resource, method, records)
+        failed = 0
+        for x in results:
+            if x["status"] >= 400:
+                failed += 1
+        self.send_result(200, {"succeeded": len(results) - failed, "failed": failed, "results": results})
+
+    def handle_import(self, path, user):
+        # Unlike handle_write, the body is not buffered and the write lock is
+        # only held per batch while the records stream in.
+        if not auth_provider.has_access(user, path, "post"):
+            self.send_response(403)
+            self.end_headers()
+            return
+        if path[0] not in bulk_processor.RESOURCES:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if data_provider.is_read_only(path[0]):
+            self.send_response(405)
+            self.send_header("Allow", "GET")
+            self.end_headers()
+            return
+        content_length = self.headers.get("Content-Length")
+        if content_length is None:
+            self.send_response(411)
+            self.end_headers()
+            return
+        lines = import_processor.read_lines(self.rfile, int(content_length))
+        self.send_result(200, import_processor.import_lines(path[0], lines))
+
+    def send_result(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        etag = None
+        last_modified = None
+        if self.cache_key is not None:
+            etag, last_modified = cache_provider.put(self.cache_key, data_provider.tracked_pools(), body, headers)
+            if self.is_not_modified(etag, last_modified):
+                self.send_not_modified(etag, last_modified)
+                return
+        self.send_body(body, etag, last_modified, headers)
+
+    def is_not_modified(self, etag, last_modified):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return True
+            for tag in if_none_match.split(","):
+                tag = tag.strip()
+                if tag.startswith("W/"):
+                    tag = tag[2:]
+                if tag == etag:
+                    return True
+            return False
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None and last_modified is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return last_modified.replace(microsecond=0) <= since
+        return False
+
+    def send_validators(self, etag, last_modified):
+        if etag is not None:
+            self.send_header("ETag", etag)
+        if last_modified is not None:
+            self.send_header("Last-Modified", email.utils.format_datetime(last_modified.astimezone(timezone.utc), usegmt=True))
+
+    def send_not_modified(self, etag, last_modified):
+        self.send_response(304)
+        self.send_validators(etag, last_modified)
+        self.end_headers()
+
+    def send_body(self, body, etag, last_modified, headers):
+        self.send_response(200)
+        self.send_header("Content-type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_validators(etag, last_modified)
+        if headers is not None:
+            for name, value in headers.items():
+                self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_page(self, pool):
+        try:
+            limit = None
+            if "limit" in self.query:
+                limit = max(int(self.query["limit"][0]), 0)
+            offset = max(int(self.query.get("offset", ["0"])[0]), 0)
+            cursor = None
+            if self.query.get("cursor", [""])[0] != "":
+                cursor = pool.key_type(self.query["cursor"][0])
+            filters = query_processor.parse_filters(self.query)
+            self.fields = query_processor.parse_fields(self.query)
+            matched = None
+            if filters:
+                matched = query_processor.filter_records(pool, filters)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        if matched is not None:
+            keys, total, next_cursor = query_processor.get_page(list(matched), limit, offset, cursor)
+            records = []
+            for key in keys:
+                records.append(matched[key])
+        if self.query.get("stream", [""])[0] in ("1", "true"):
+            if matched is None:
+                keys, total, next_cursor = pool.get_page_keys(limit, offset, cursor)
+            # Only the ids are taken under the read lock; do_GET encodes and
+            # writes the records in batches once the lock is released.
+            self.stream = (pool, keys)
+            self.chunked = self.request_version == "HTTP/1.1"
+            if self.chunked:
+                self.protocol_version = "HTTP/1.1"
+        elif matched is None:
+            records, total, next_cursor = pool.get_page(limit, offset, cursor)
+        headers = {"X-Total-Count": str(total)}
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = str(next_cursor)
+        if self.stream is None:
+            if self.fields is not None:
+                projected = []
+                for x in records:
+                    projected.append(query_processor.project(x, self.fields))
+                records = projected
+            self.send_json(records, headers)
+            return
+        etag = cache_provider.make_etag([pool])
+        last_modified = cache_provider.get_last_modified([pool])
+        if self.is_not_modified(etag, last_modified):
+            self.stream = None
+            self.send_not_modified(etag, last_modified)
+            return
+        self.send_response(200)
+        self.send_header("Content-type", "application/json")
+        self.send_validators(etag, last_modified)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if self.chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+    def send_changes(self, pool):
+        try:
+            since = self.query.get("since", [""])[0] or None
+            limit = max(int(self.query.get("limit", [str(changes_provider.CHANGES_DEFAULT_LIMIT)])[0]), 1)
+            changes, token, more = changes_provider.get_changes(pool, since, limit)
+        except changes_provider.ExpiredToken:
+            self.cache_key = None
+            self.send_result(410, {"error": "token expired, sync again without since"})
+            return
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        self.send_json({"changes": changes, "next": token, "more": more})
+
+    def send_search(self):
+        try:
+            query = self.query.get("q", [""])[0]
+            names = list(search_provider.SEARCH_FIELDS)
+            if self.query.get("type", [""])[0] != "":
+                names = self.query["type"][0].split(",")
+                for name in names:
+                    if name not in search_provider.SEARCH_FIELDS:
+                        raise ValueError(name)
+            limit = max(int(self.query.get("limit", [str(search_provider.SEARCH_DEFAULT_LIMIT)])[0]), 0)
+            offset = max(int(self.query.get("offset", ["0"])[0]), 0)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        for name in names:
+            data_provider.track(data_provider.fetch_pool(name))
+        results, total = search_provider.search(query, names, limit, offset)
+        self.send_json(results, {"X-Total-Count": str(total)})
+
+    def start_events(self):
+        self.cache_key = None
+        types = None
+        if self.query.get("types", [""])[0] != "":
+            types = self.query["types"][0].split(",")
+        try:
+            last_event_id = None
+            if self.headers.get("Last-Event-ID"):
+                last_event_id = int(self.headers["Last-Event-ID"])
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        subscriber = event_processor.subscribe(types, last_event_id)
+        if subscriber is None:
+            self.send_response(503)
+            self.send_header("Retry-After", "10")
+            self.end_headers()
+            return
+        # The stream is handed off by do_GET once the read lock is released.
+        # It ends when the connection closes, so it needs no chunking.
+        self.events = subscriber
+        self.send_response(200)
+        self.send_header("Content-type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+    def hand_off_events(self, subscriber):
+        # Open streams are written outside the request workers: by the
+        # asyncio front end's loop, or by the event writer's thread, which
+        # takes over the socket of the threaded front ends.
+        if isinstance(self.wfile, ResponseWriter):
+            self.wfile.events = subscriber
+        else:
+            event_writer.add(socket.socket(fileno=self.request.detach()), subscriber)
+
+    def write_chunk(self, data):
+        if self.chunked:
+            self.wfile.write(b"%x\r\n" % len(data) + data + b"\r\n")
+        else:
+            self.wfile.write(data)
+
+    def write_stream(self, pool, keys):
+        self.write_chunk(b"[")
+        first = True
+        for i in range(0, len(keys), STREAM_BATCH_SIZE):
+            parts = []
+            with data_provider.read_lock():
+                for key in keys[i:i + STREAM_BATCH_SIZE]:
+                    record = pool.get_record(key)
+                    if record is not None:
+                        if self.fields is not None:
+                            record = query_processor.project(record, self.fields)
+                        parts.append(json.dumps(record))
+            if not parts:
+                continue
+            data = ", ".join(parts)
+            if not first:
+                data = ", " + data
+            first = False
+            self.write_chunk(data.encode("utf-8"))
+        self.write_chunk(b"]")
+        if self.chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
     def handle_get_version_1(self, path, user):
         if not auth_provider.has_access(user, path, "get"):
             self.send_response(403)
             self.end_headers()
             return
+        if "stream" not in self.query:
+            validators = cache_provider.get_validators(self.route)
+            if validators is not None and self.is_not_modified(*validators):
+                self.send_not_modified(*validators)
+                return
+            cached = cache_provider.get(self.route)
+            if cached is not None:
+                self.send_body(cached["body"], cached["etag"], cached["last_modified"], cached["headers"])
+                return
+            self.cache_key = self.route
+            data_provider.track_pools()
+        if len(path) == 2 and path[1] == "changes" and path[0] in bulk_processor.RESOURCES:
+            self.send_changes(data_provider.track(data_provider.fetch_pool(path[0])))
+            return
         if path[0] == "warehouses":
             paths = len(path)
             match paths:
                 case 1:
-                    warehouses = data_provider.fetch_warehouse_pool().get_warehouses()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(warehouses).encode("utf-8"))
+                    self.send_page(data_provider.fetch_warehouse_pool())
                 case 2:
                     warehouse_id = int(path[1])
                     warehouse = data_provider.fetch_warehouse_pool().get_warehouse(warehouse_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(warehouse).encode("utf-8"))
+                    self.send_json(warehouse)
                 case 3:
                     if path[2] == "locations":
                         warehouse_id = int(path[1])
                         locations = data_provider.fetch_location_pool().get_locations_in_warehouse(warehouse_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(locations).encode("utf-8"))
+                        self.send_json(locations)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -49,18 +376,11 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             paths = len(path)
             match paths:
                 case 1:
-                    locations = data_provider.fetch_location_pool().get_locations()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(locations).encode("utf-8"))
+                    self.send_page(data_provider.fetch_location_pool())
                 case 2:
                     location_id = int(path[1])
                     location = data_provider.fetch_location_pool().get_location(location_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(location).encode("utf-8"))
+                    self.send_json(location)
                 case _:
                     self.send_response(404)
                     self.end_headers()
@@ -68,26 +388,16 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             paths = len(path)
             match paths:
                 case 1:
-                    transfers = data_provider.fetch_transfer_pool().get_transfers()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(transfers).encode("utf-8"))
+                    self.send_page(data_provider.fetch_transfer_pool())
                 case 2:
                     transfer_id = int(path[1])
                     transfer = data_provider.fetch_transfer_pool().get_transfer(transfer_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(transfer).encode("utf-8"))
+                    self.send_json(transfer)
                 case 3:
                     if path[2] == "items":
                         transfer_id = int(path[1])
                         items = data_provider.fetch_transfer_pool().get_items_in_transfer(transfer_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(items).encode("utf-8"))
+                        self.send_json(items)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -98,26 +408,16 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             paths = len(path)
             match paths:
                 case 1:
-                    items = data_provider.fetch_item_pool().get_items()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(items).encode("utf-8"))
+                    self.send_page(data_provider.fetch_item_pool())
                 case 2:
                     item_id = path[1]
                     item = data_provider.fetch_item_pool().get_item(item_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(item).encode("utf-8"))
+                    self.send_json(item)
                 case 3:
                     if path[2] == "inventory":
                         item_id = path[1]
                         inventories = data_provider.fetch_inventory_pool().get_inventories_for_item(item_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(inventories).encode("utf-8"))
+                        self.send_json(inventories)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -125,10 +425,7 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
                     if path[2] == "inventory" and path[3] == "totals":
                         item_id = path[1]
                         totals = data_provider.fetch_inventory_pool().get_inventory_totals_for_item(item_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(totals).encode("utf-8"))
+                        self.send_json(totals)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -141,26 +438,16 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
 
             match paths:
                 case 1:
-                    item_lines = data_provider.fetch_item_line_pool().get_item_lines()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(item_lines).encode("utf-8"))
+                    self.send_page(data_provider.fetch_item_line_pool())
                 case 2:
                     item_line_id = int(path[1])
                     item_line = data_provider.fetch_item_line_pool().get_item_line(item_line_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(item_line).encode("utf-8"))
+                    self.send_json(item_line)
                 case 3:
                     if path[2] == "items":
                         item_line_id = int(path[1])
                         items = data_provider.fetch_item_pool().get_items_for_item_line(item_line_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(items).encode("utf-8"))
+                        self.send_json(items)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -171,26 +458,16 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             paths = len(path)
             match paths:
                 case 1:
-                    item_groups = data_provider.fetch_item_group_pool().get_item_groups()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(item_groups).encode("utf-8"))
+                    self.send_page(data_provider.fetch_item_group_pool())
                 case 2:
                     item_group_id = int(path[1])
                     item_group = data_provider.fetch_item_group_pool().get_item_group(item_group_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(item_group).encode("utf-8"))
+                    self.send_json(item_group)
                 case 3:
                     if path[2] == "items":
                         item_group_id = int(path[1])
                         items = data_provider.fetch_item_pool().get_items_for_item_group(item_group_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(items).encode("utf-8"))
+                        self.send_json(items)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -201,26 +478,16 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             paths = len(path)
             match paths:
                 case 1:
-                    item_types = data_provider.fetch_item_type_pool().get_item_types()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(item_types).encode("utf-8"))
+                    self.send_page(data_provider.fetch_item_type_pool())
                 case 2:
                     item_type_id = int(path[1])
                     item_type = data_provider.fetch_item_type_pool().get_item_type(item_type_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(item_type).encode("utf-8"))
+                    self.send_json(item_type)
                 case 3:
                     if path[2] == "items":
                         item_type_id = int(path[1])
                         items = data_provider.fetch_item_pool().get_items_for_item_type(item_type_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(items).encode("utf-8"))
+                        self.send_json(items)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -231,18 +498,11 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             paths = len(path)
             match paths:
                 case 1:
-                    inventories = data_provider.fetch_inventory_pool().get_inventories()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(inventories).encode("utf-8"))
+                    self.send_page(data_provider.fetch_inventory_pool())
                 case 2:
                     inventory_id = int(path[1])
                     inventory = data_provider.fetch_inventory_pool().get_inventory(inventory_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(inventory).encode("utf-8"))
+                    self.send_json(inventory)
                 case _:
                     self.send_response(404)
                     self.end_headers()
@@ -250,26 +510,16 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             paths = len(path)
             match paths:
                 case 1:
-                    suppliers = data_provider.fetch_supplier_pool().get_suppliers()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(suppliers).encode("utf-8"))
+                    self.send_page(data_provider.fetch_supplier_pool())
                 case 2:
                     supplier_id = int(path[1])
                     supplier = data_provider.fetch_supplier_pool().get_supplier(supplier_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(supplier).encode("utf-8"))
+                    self.send_json(supplier)
                 case 3:
                     if path[2] == "items":
                         supplier_id = int(path[1])
                         items = data_provider.fetch_item_pool().get_items_for_supplier(supplier_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(items).encode("utf-8"))
+                        self.send_json(items)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -280,26 +530,16 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             paths = len(path)
             match paths:
                 case 1:
-                    orders = data_provider.fetch_order_pool().get_orders()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(orders).encode("utf-8"))
+                    self.send_page(data_provider.fetch_order_pool())
                 case 2:
                     order_id = int(path[1])
                     order = data_provider.fetch_order_pool().get_order(order_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(order).encode("utf-8"))
+                    self.send_json(order)
                 case 3:
                     if path[2] == "items":
                         order_id = int(path[1])
                         items = data_provider.fetch_order_pool().get_items_in_order(order_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(items).encode("utf-8"))
+                        self.send_json(items)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -310,26 +550,16 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             paths = len(path)
             match paths:
                 case 1:
-                    clients = data_provider.fetch_client_pool().get_clients()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(clients).encode("utf-8"))
+                    self.send_page(data_provider.fetch_client_pool())
                 case 2:
                     client_id = int(path[1])
                     client = data_provider.fetch_client_pool().get_client(client_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(client).encode("utf-8"))
+                    self.send_json(client)
                 case 3:
                     if path[2] == "orders":
                         client_id = int(path[1])
                         orders = data_provider.fetch_order_pool().get_orders_for_client(client_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(orders).encode("utf-8"))
+                        self.send_json(orders)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -340,44 +570,43 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             paths = len(path)
             match paths:
                 case 1:
-                    shipments = data_provider.fetch_shipment_pool().get_shipments()
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(shipments).encode("utf-8"))
+                    self.send_page(data_provider.fetch_shipment_pool())
                 case 2:
                     shipment_id = int(path[1])
                     shipment = data_provider.fetch_shipment_pool().get_shipment(shipment_id)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(shipment).encode("utf-8"))
+                    self.send_json(shipment)
                 case 3:
                     if path[2] == "orders":
                         shipment_id = int(path[1])
                         orders = data_provider.fetch_order_pool().get_orders_in_shipment(shipment_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(orders).encode("utf-8"))
+                        self.send_json(orders)
                     elif path[2] == "items":
                         shipment_id = int(path[1])
                         items = data_provider.fetch_shipment_pool().get_items_in_shipment(shipment_id)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(items).encode("utf-8"))
+                        self.send_json(items)
                     else:
                         self.send_response(404)
                         self.end_headers()
                 case _:
                     self.send_response(404)
                     self.end_headers()
+        elif path[0] == "search" and len(path) == 1:
+            self.send_search()
+        elif path[0] == "events" and len(path) == 1:
+            self.start_events()
         else:
             self.send_response(404)
             self.end_headers()
 
     def do_GET(self):
+        if self.path == "/health":
+            # Answered without a key or any pool, so load balancers can see
+            # the process is up while the pools are still warming up.
+            self.cache_key = None
+            self.send_json({"status": "ok", "pools": data_provider.get_load_status(),
+                            "notifications": notification_processor.get_metrics(),
+                            "events": event_processor.get_metrics()})
+            return
         api_key = self.headers.get("API_KEY")
         user = auth_provider.get_user(api_key)
         if user == None:
@@ -385,9 +614,31 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             self.end_headers()
         else:
             try:
-                path = self.path.split("/")
+                url = urllib.parse.urlsplit(self.path)
+                self.query = urllib.parse.parse_qs(url.query, keep_blank_values=True)
+                self.route = self.path
+                path = url.path.split("/")
                 if len(path) > 3 and path[1] == "api" and path[2] == "v1":
-                    self.handle_get_version_1(path[3:], user)
+                    self.stream = None
+                    self.events = None
+                    self.cache_key = None
+                    # The response is built in memory under the read lock and
+                    # only written once it is released, so a client that reads
+                    # slowly can't hold up the writers (and the readers queued
+                    # behind them).
+                    wfile = self.wfile
+                    self.wfile = io.BytesIO()
+                    try:
+                        with data_provider.read_lock():
+                            self.handle_get_version_1(path[3:], user)
+                        response = self.wfile.getvalue()
+                    finally:
+                        self.wfile = wfile
+                    self.wfile.write(response)
+                    if self.stream is not None:
+                        self.write_stream(*self.stream)
+                    if self.events is not None:
+                        self.hand_off_events(self.events)
             except Exception:
                 self.send_response(500)
                 self.end_headers()
@@ -397,6 +648,9 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             self.send_response(403)
             self.end_headers()
             return
+        if len(path) == 2 and path[1] == "bulk" and path[0] in bulk_processor.RESOURCES:
+            self.handle_bulk(path[0], "post")
+            return
         if path[0] == "warehouses":
             content_length = int(self.headers["Content-Length"])
             post_data = self.rfile.read(content_length)
@@ -483,8 +737,10 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
         else:
             try:
                 path = self.path.split("/")
-                if len(path) > 3 and path[1] == "api" and path[2] == "v1":
-                    self.handle_post_version_1(path[3:], user)
+                if len(path) == 5 and path[1] == "api" and path[2] == "v1" and path[4] == "import":
+                    self.handle_import(path[3:], user)
+                elif len(path) > 3 and path[1] == "api" and path[2] == "v1":
+                    self.handle_write(self.handle_post_version_1, path[3:], user)
             except Exception:
                 self.send_response(500)
                 self.end_headers()
@@ -494,6 +750,9 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             self.send_response(403)
             self.end_headers()
             return
+        if len(path) == 2 and path[1] == "bulk" and path[0] in bulk_processor.RESOURCES:
+            self.handle_bulk(path[0], "put")
+            return
         if path[0] == "warehouses":
             warehouse_id = int(path[1])
             content_length = int(self.headers["Content-Length"])
@@ -515,6 +774,11 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
         elif path[0] == "transfers":
             paths = len(path)
             match paths:
+                case 2 if path[1] == "commit":
+                    content_length = int(self.headers["Content-Length"])
+                    post_data = self.rfile.read(content_length)
+                    transfer_ids = json.loads(post_data.decode())
+                    self.commit_transfers([int(x) for x in transfer_ids])
                 case 2:
                     transfer_id = int(path[1])
                     content_length = int(self.headers["Content-Length"])
@@ -527,27 +791,7 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
                 case 3:
                     if path[2] == "commit":
                         transfer_id = int(path[1])
-                        transfer = data_provider.fetch_transfer_pool().get_transfer(transfer_id)
-                        for x in transfer["items"]:
-                            inventories = data_provider.fetch_inventory_pool().get_inventories_for_item(x["item_id"])
-                            for y in inventories:
-                                if y["location_id"] == transfer["transfer_from"]:
-                                    y["total_on_hand"] -= x["amount"]
-                                    y["total_expected"] = y["total_on_hand"] + y["total_ordered"]
-                                    y["total_available"] = y["total_on_hand"] - y["total_allocated"]
-                                    data_provider.fetch_inventory_pool().update_inventory(y["id"], y)
-                                elif y["location_id"] == transfer["transfer_to"]:
-                                    y["total_on_hand"] += x["amount"]
-                                    y["total_expected"] = y["total_on_hand"] + y["total_ordered"]
-                                    y["total_available"] = y["total_on_hand"] - y["total_allocated"]
-                                    data_provider.fetch_inventory_pool().update_inventory(y["id"], y)
-                        transfer["transfer_status"] = "Processed"
-                        data_provider.fetch_transfer_pool().update_transfer(transfer_id, transfer)
-                        notification_processor.push(f"Processed batch transfer with id:{transfer['id']}")
-                        data_provider.fetch_transfer_pool().save()
-                        data_provider.fetch_inventory_pool().save()
-                        self.send_response(200)
-                        self.end_headers()
+                        self.commit_transfers([transfer_id])
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -698,7 +942,7 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             try:
                 path = self.path.split("/")
                 if len(path) > 3 and path[1] == "api" and path[2] == "v1":
-                    self.handle_put_version_1(path[3:], user)
+                    self.handle_write(self.handle_put_version_1, path[3:], user)
             except Exception:
                 self.send_response(500)
                 self.end_headers()
@@ -708,6 +952,9 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             self.send_response(403)
             self.end_headers()
             return
+        if len(path) == 2 and path[1] == "bulk" and path[0] in bulk_processor.RESOURCES:
+            self.handle_bulk(path[0], "delete")
+            return
         if path[0] == "warehouses":
             warehouse_id = int(path[1])
             data_provider.fetch_warehouse_pool().remove_warehouse(warehouse_id)
@@ -794,7 +1041,7 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
             try:
                 path = self.path.split("/")
                 if len(path) > 3 and path[1] == "api" and path[2] == "v1":
-                    self.handle_delete_version_1(path[3:], user)
+                    self.handle_write(self.handle_delete_version_1, path[3:], user)
             except Exception:
                 self.send_response(500)
                 self.end_headers()
@@ -802,9 +1049,21 @@ class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
 
 if __name__ == "__main__":
     PORT = 3000
-    with socketserver.TCPServer(("", PORT), ApiRequestHandler) as httpd:
+    if SERVER_MODE == "async":
+        server = AsyncServer(("", PORT), ApiRequestHandler, SERVER_WORKERS)
+    elif SERVER_MODE == "threaded":
+        server = ThreadPoolServer(("", PORT), ApiRequestHandler, SERVER_WORKERS, SERVER_QUEUE_SIZE)
+    else:
+        server = socketserver.TCPServer(("", PORT), ApiRequestHandler)
+    with server as httpd:
         auth_provider.init()
+        cache_provider.init()
+        search_provider.init()
+        changes_provider.init()
+        event_processor.init()
         data_provider.init()
+        data_provider.start_compaction()
+        search_provider.start()
         notification_processor.start()
         print(f"Serving on port {PORT}...")
         httpd.serve_forever()
@@ -1,8 +1,267 @@
-from datetime import datetime
+import json
+import os
+import pickle
+import threading
+from datetime import datetime, timezone
+
+from providers import json_provider
+from storage import mapped_storage
+from storage import snapshot
+from storage.memory_storage import MemoryStorage
+from storage.sqlite_storage import SQLiteStorage
+
+DATABASE_FILE = "cargohub.db"
+
+class InvalidKey(ValueError):
+    pass
+
 
 class Base:
+    key = "id"
+    key_type = int
+    indexes = []
+    storage = "json"
+
     def __init__():
         pass
 
     def get_timestamp(self):
-        return datetime.utcnow().isoformat() + "Z"
\ No newline at end of file
+        return datetime.utcnow().isoformat() + "Z"
+
+    def parse_timestamp(self, value):
+        if not isinstance(value, str):
+            return None
+        try:
+            timestamp = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp
+
+    def reset(self):
+        self.pending = {}
+        self.journal_size = 0
+        self.journal_lock = threading.Lock()
+        self.version = 0
+        self.last_modified = None
+        self.listeners = []
+
+    def load_records(self, records):
+        self.reset()
+        self.data = self.create_storage()
+        for x in records:
+            self.store_record(x[self.key], x)
+
+    def create_storage(self):
+        return MemoryStorage(self.indexes)
+
+    def load_database(self):
+        storage = SQLiteStorage(self.get_database_path(), self.get_name(), self.key_type, self.indexes)
+        if storage.is_empty() and os.path.exists(self.data_path):
+            # First start on SQLite: import the existing JSON file once,
+            # with the journal entries not compacted into it yet.
+            self.load_records(self.read_records())
+            self.replay_journal()
+            for key, record in self.data.items():
+                storage.put(key, record)
+            storage.commit()
+        self.reset()
+        self.data = storage
+        for key, record in self.data.items():
+            self.track_record(key, record)
+
+    def read_records(self):
+        records = snapshot.read(self.data_path)
+        if records is not None:
+            return records
+        records = json_provider.read(self.data_path)
+        try:
+            # Written right away so the next start can skip the JSON parse.
+            snapshot.write(self.data_path, records)
+        except OSError as e:
+            print(f"Writing snapshot for {self.get_name()} failed: {e}")
+        return records
+
+    def load_mapped(self):
+        path = mapped_storage.get_path(self.data_path)
+        if not mapped_storage.is_fresh(path, [self.data_path, self.get_journal_path()]):
+            self.load_records(self.read_records())
+            self.replay_journal()
+            mapped_storage.write(path, self.data.values(), self.key, self.last_modified)
+        self.reset()
+        self.data = mapped_storage.MappedStorage(path)
+        self.last_modified = self.parse_timestamp(self.data.last_modified)
+
+    def get_database_path(self):
+        return os.path.join(os.path.dirname(self.data_path), DATABASE_FILE)
+
+    def coerce_key(self, key):
+        # Ids come straight from request bodies; a "7" next to the int keys
+        # would break every sorted listing of the pool.
+        if isinstance(key, bool) or not isinstance(key, (int, str)):
+            raise InvalidKey(f"{self.key} must be a string or a number")
+        try:
+            return self.key_type(key)
+        except ValueError:
+            raise InvalidKey(f"invalid {self.key}: {key}")
+
+    def put_record(self, key, record):
+        key = self.coerce_key(key)
+        record[self.key] = key
+        self.store_record(key, record)
+        self.pending[key] = None
+        self.notify("put", key, record)
+
+    def drop_record(self, key):
+        self.discard_record(key)
+        self.pending[key] = None
+        self.notify("remove", key, None)
+
+    def get_name(self):
+        return os.path.splitext(os.path.basename(self.data_path))[0]
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def notify(self, op, key, record):
+        self.version += 1
+        for listener in self.listeners:
+            listener(self, op, key, record)
+
+    def store_record(self, key, record):
+        self.data.put(key, record)
+        self.track_record(key, record)
+
+    def discard_record(self, key):
+        if key in self.data:
+            self.data.remove(key)
+            self.untrack_record(key)
+
+    def track_record(self, key, record):
+        modified = self.parse_timestamp(record.get("updated_at"))
+        if modified is not None and (self.last_modified is None or modified > self.last_modified):
+            self.last_modified = modified
+
+    def untrack_record(self, key):
+        # A removal leaves no updated_at behind, so it counts as "now".
+        self.last_modified = datetime.now(timezone.utc)
+
+    def get_record(self, key):
+        return self.data.get(key)
+
+    def get_page_keys(self, limit=None, offset=0, cursor=None):
+        # Pages are cut from the ids in sorted order, so a cursor (the last id
+        # of the previous page) stays valid while records are added or removed.
+        return self.data.page_keys(limit, offset, cursor)
+
+    def get_page(self, limit=None, offset=0, cursor=None):
+        keys, total, next_cursor = self.get_page_keys(limit, offset, cursor)
+        return self.data.get_many(keys), total, next_cursor
+
+    def find_records(self, field, value):
+        return self.data.find(field, value)
+
+    def get_journal_path(self):
+        return os.path.splitext(self.data_path)[0] + ".journal"
+
+    def replay_journal(self):
+        # A leftover ".compacting" file means the process stopped before a
+        # compaction finished; its entries are older than the live journal.
+        for path in [self.get_journal_path() + ".compacting", self.get_journal_path()]:
+            if not os.path.exists(path):
+                continue
+            f = open(path, "rb")
+            offset = 0
+            torn = False
+            for line in f:
+                # Every entry is written with its newline, so a line without
+                # one was cut short even if what is there still parses.
+                if not line.endswith(b"\n"):
+                    torn = True
+                    break
+                try:
+                    entry = json_provider.loads(line)
+                except ValueError:
+                    torn = True
+                    break
+                if entry["op"] == "put":
+                    self.store_record(entry["key"], entry["record"])
+                else:
+                    self.discard_record(entry["key"])
+                self.journal_size += 1
+                offset += len(line)
+            f.close()
+            if torn:
+                # Torn write at the tail of the journal, nothing after it was
+                # acknowledged. Cut it off so new entries start on a clean line.
+                os.truncate(path, offset)
+
+    def save(self):
+        if self.storage == "sqlite":
+            self.pending = {}
+            self.data.commit()
+            return
+        with self.journal_lock:
+            if not self.pending:
+                return
+            f = open(self.get_journal_path(), "a")
+            for key in self.pending:
+                record = self.data.get(key)
+                if record is None:
+                    f.write(json.dumps({"op": "remove", "key": key}) + "\n")
+                else:
+                    f.write(json.dumps({"op": "put", "key": key, "record": record}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+            self.journal_size += len(self.pending)
+            self.pending = {}
+
+    def compact(self):
+        copy = self.start_compaction()
+        if copy is not None:
+            self.finish_compaction(copy)
+
+    def start_compaction(self):
+        # Runs under the read lock: moves the journal aside and takes a
+        # pickled copy of the records (cheaper than encoding them as JSON),
+        # which later in-place changes can't reach. Writing the files is
+        # left to finish_compaction(), after the lock is released. Returns
+        # None when there is nothing to compact.
+        if self.storage == "sqlite":
+            self.data.checkpoint()
+            return None
+        journal_path = self.get_journal_path()
+        compacting_path = journal_path + ".compacting"
+        with self.journal_lock:
+            if self.journal_size == 0:
+                return None
+            copy = pickle.dumps(list(self.data.values()), protocol=5)
+            if not os.path.exists(journal_path):
+                pass
+            elif os.path.exists(compacting_path):
+                src = open(journal_path, "r")
+                dst = open(compacting_path, "a")
+                dst.write(src.read())
+                dst.close()
+                src.close()
+                os.remove(journal_path)
+            else:
+                os.replace(journal_path, compacting_path)
+            self.journal_size = 0
+        return copy
+
+    def finish_compaction(self, copy):
+        compacting_path = self.get_journal_path() + ".compacting"
+        records = pickle.loads(copy)
+        tmp_path = self.data_path + ".tmp"
+        f = open(tmp_path, "w")
+        json.dump(records, f)
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(tmp_path, self.data_path)
+        snapshot.write(self.data_path, records)
+        if os.path.exists(compacting_path):
+            os.remove(compacting_path)
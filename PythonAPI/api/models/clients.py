@@ -1,50 +1,40 @@
-import json
-
 from models.base import Base
 
 CLIENTS = []
 
 
 class Clients(Base):
-    def __init__(self, root_path, is_debug=False):
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "clients.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_clients(self):
-        return self.data
+        return list(self.data.values())
 
     def get_client(self, client_id):
-        for x in self.data:
-            if x["id"] == client_id:
-                return x
-        return None
+        return self.data.get(client_id)
 
     def add_client(self, client):
         client["created_at"] = self.get_timestamp()
         client["updated_at"] = self.get_timestamp()
-        self.data.append(client)
+        self.put_record(client["id"], client)
 
     def update_client(self, client_id, client):
         client["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == client_id:
-                self.data[i] = client
-                break
+        if client_id in self.data:
+            self.put_record(client_id, client)
 
     def remove_client(self, client_id):
-        for x in self.data:
-            if x["id"] == client_id:
-                self.data.remove(x)
+        self.drop_record(client_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = CLIENTS
+            self.load_records(CLIENTS)
+        elif self.storage == "sqlite":
+            self.load_database()
+        elif self.storage == "mapped":
+            self.load_mapped()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
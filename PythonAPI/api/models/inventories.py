@@ -1,72 +1,62 @@
-import json
-
 from models.base import Base
+from storage.column_storage import ColumnStorage
 
 INVENTORIES = []
 
+TOTAL_FIELDS = ["total_expected", "total_ordered", "total_allocated", "total_available", "total_on_hand"]
+
+FIELDS = ["id", "item_id", "description", "item_reference", "locations", "location_id", "total_on_hand",
+          "total_expected", "total_ordered", "total_allocated", "total_available", "created_at", "updated_at"]
+INT_FIELDS = ["id", "location_id"] + TOTAL_FIELDS
+
 
 class Inventories(Base):
-    def __init__(self, root_path, is_debug=False):
+    indexes = ["item_id"]
+
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "inventories.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_inventories(self):
-        return self.data
+        return list(self.data.values())
 
     def get_inventory(self, inventory_id):
-        for x in self.data:
-            if x["id"] == inventory_id:
-                return x
-        return None
+        return self.data.get(inventory_id)
 
     def get_inventories_for_item(self, item_id):
-        result = []
-        for x in self.data:
-            if x["item_id"] == item_id:
-                result.append(x)
-        return result
+        return self.find_records("item_id", item_id)
 
     def get_inventory_totals_for_item(self, item_id):
-        result = {
-            "total_expected": 0,
-            "total_ordered": 0,
-            "total_allocated": 0,
-            "total_available": 0
-        }
-        for x in self.data:
-            if x["item_id"] == item_id:
-                result["total_expected"] += x["total_expected"]
-                result["total_ordered"] += x["total_ordered"]
-                result["total_allocated"] += x["total_allocated"]
-                result["total_available"] += x["total_available"]
+        result = {}
+        totals = self.data.sum_fields("item_id", item_id, TOTAL_FIELDS)
+        for field, total in zip(TOTAL_FIELDS, totals):
+            result[field] = total
         return result
 
+    def create_storage(self):
+        # Inventories is the busiest pool; rows are kept in columns rather
+        # than a dict per record, and the per-item totals are kept running.
+        return ColumnStorage(self.indexes, FIELDS, INT_FIELDS, ("item_id", TOTAL_FIELDS))
+
     def add_inventory(self, inventory):
         inventory["created_at"] = self.get_timestamp()
         inventory["updated_at"] = self.get_timestamp()
-        self.data.append(inventory)
+        self.put_record(inventory["id"], inventory)
 
     def update_inventory(self, inventory_id, inventory):
         inventory["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == inventory_id:
-                self.data[i] = inventory
-                break
+        if inventory_id in self.data:
+            self.put_record(inventory_id, inventory)
 
     def remove_inventory(self, inventory_id):
-        for x in self.data:
-            if x["id"] == inventory_id:
-                self.data.remove(x)
+        self.drop_record(inventory_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = INVENTORIES
+            self.load_records(INVENTORIES)
+        elif self.storage == "sqlite":
+            self.load_database()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
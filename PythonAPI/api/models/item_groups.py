@@ -1,50 +1,38 @@
-import json
-
 from models.base import Base
 
 ITEM_GROUPS = []
 
 
 class ItemGroups(Base):
-    def __init__(self, root_path, is_debug=False):
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "item_groups.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_item_groups(self):
-        return self.data
+        return list(self.data.values())
 
     def get_item_group(self, item_group_id):
-        for x in self.data:
-            if x["id"] == item_group_id:
-                return x
-        return None
+        return self.data.get(item_group_id)
 
     def add_item_group(self, item_group):
         item_group["created_at"] = self.get_timestamp()
         item_group["updated_at"] = self.get_timestamp()
-        self.data.append(item_group)
+        self.put_record(item_group["id"], item_group)
 
     def update_item_group(self, item_group_id, item_group):
         item_group["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == item_group_id:
-                self.data[i] = item_group
-                break
+        if item_group_id in self.data:
+            self.put_record(item_group_id, item_group)
 
     def remove_item_group(self, item_group_id):
-        for x in self.data:
-            if x["id"] == item_group_id:
-                self.data.remove(x)
+        self.drop_record(item_group_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = ITEM_GROUPS
+            self.load_records(ITEM_GROUPS)
+        elif self.storage == "sqlite":
+            self.load_database()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
@@ -1,50 +1,38 @@
-import json
-
 from models.base import Base
 
 ITEM_LINES = []
 
 
 class ItemLines(Base):
-    def __init__(self, root_path, is_debug=False):
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "item_lines.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_item_lines(self):
-        return self.data
+        return list(self.data.values())
 
     def get_item_line(self, item_line_id):
-        for x in self.data:
-            if x["id"] == item_line_id:
-                return x
-        return None
+        return self.data.get(item_line_id)
 
     def add_item_line(self, item_line):
         item_line["created_at"] = self.get_timestamp()
         item_line["updated_at"] = self.get_timestamp()
-        self.data.append(item_line)
+        self.put_record(item_line["id"], item_line)
 
     def update_item_line(self, item_line_id, item_line):
         item_line["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == item_line_id:
-                self.data[i] = item_line
-                break
+        if item_line_id in self.data:
+            self.put_record(item_line_id, item_line)
 
     def remove_item_line(self, item_line_id):
-        for x in self.data:
-            if x["id"] == item_line_id:
-                self.data.remove(x)
+        self.drop_record(item_line_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = ITEM_LINES
+            self.load_records(ITEM_LINES)
+        elif self.storage == "sqlite":
+            self.load_database()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
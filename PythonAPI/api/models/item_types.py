@@ -1,50 +1,38 @@
-import json
-
 from models.base import Base
 
 ITEM_TYPES = []
 
 
 class ItemTypes(Base):
-    def __init__(self, root_path, is_debug=False):
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "item_types.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_item_types(self):
-        return self.data
+        return list(self.data.values())
 
     def get_item_type(self, item_type_id):
-        for x in self.data:
-            if x["id"] == item_type_id:
-                return x
-        return None
+        return self.data.get(item_type_id)
 
     def add_item_type(self, item_type):
         item_type["created_at"] = self.get_timestamp()
         item_type["updated_at"] = self.get_timestamp()
-        self.data.append(item_type)
+        self.put_record(item_type["id"], item_type)
 
     def update_item_type(self, item_type_id, item_type):
         item_type["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == item_type_id:
-                self.data[i] = item_type
-                break
+        if item_type_id in self.data:
+            self.put_record(item_type_id, item_type)
 
     def remove_item_type(self, item_type_id):
-        for x in self.data:
-            if x["id"] == item_type_id:
-                self.data.remove(x)
+        self.drop_record(item_type_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = ITEM_TYPES
+            self.load_records(ITEM_TYPES)
+        elif self.storage == "sqlite":
+            self.load_database()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
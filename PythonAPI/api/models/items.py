@@ -1,78 +1,54 @@
-import json
-
 from models.base import Base
 
 ITEMS = []
 
 
 class Items(Base):
-    def __init__(self, root_path, is_debug=False):
+    key = "uid"
+    key_type = str
+    indexes = ["item_line", "item_group", "item_type", "supplier_id"]
+
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "items.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_items(self):
-        return self.data
+        return list(self.data.values())
 
     def get_item(self, item_id):
-        for x in self.data:
-            if x["uid"] == item_id:
-                return x
-        return None
+        return self.data.get(item_id)
 
     def get_items_for_item_line(self, item_line_id):
-        result = []
-        for x in self.data:
-            if x["item_line"] == item_line_id:
-                result.append(x)
-        return result
+        return self.find_records("item_line", item_line_id)
 
     def get_items_for_item_group(self, item_group_id):
-        result = []
-        for x in self.data:
-            if x["item_group"] == item_group_id:
-                result.append(x)
-        return result
+        return self.find_records("item_group", item_group_id)
 
     def get_items_for_item_type(self, item_type_id):
-        result = []
-        for x in self.data:
-            if x["item_type"] == item_type_id:
-                result.append(x)
-        return result
+        return self.find_records("item_type", item_type_id)
 
     def get_items_for_supplier(self, supplier_id):
-        result = []
-        for x in self.data:
-            if x["supplier_id"] == supplier_id:
-                result.append(x)
-        return result
+        return self.find_records("supplier_id", supplier_id)
 
     def add_item(self, item):
         item["created_at"] = self.get_timestamp()
         item["updated_at"] = self.get_timestamp()
-        self.data.append(item)
+        self.put_record(item["uid"], item)
 
     def update_item(self, item_id, item):
         item["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["uid"] == item_id:
-                self.data[i] = item
-                break
+        if item_id in self.data:
+            self.put_record(item_id, item)
 
     def remove_item(self, item_id):
-        for x in self.data:
-            if x["uid"] == item_id:
-                self.data.remove(x)
+        self.drop_record(item_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = ITEMS
+            self.load_records(ITEMS)
+        elif self.storage == "sqlite":
+            self.load_database()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
@@ -1,57 +1,43 @@
-import json
-
 from models.base import Base
 
 LOCATIONS = []
 
 
 class Locations(Base):
-    def __init__(self, root_path, is_debug=False):
+    indexes = ["warehouse_id"]
+
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "locations.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_locations(self):
-        return self.data
+        return list(self.data.values())
 
     def get_location(self, location_id):
-        for x in self.data:
-            if x["id"] == location_id:
-                return x
-        return None
+        return self.data.get(location_id)
 
     def get_locations_in_warehouse(self, warehouse_id):
-        result = []
-        for x in self.data:
-            if x["warehouse_id"] == warehouse_id:
-                result.append(x)
-        return result
+        return self.find_records("warehouse_id", warehouse_id)
 
     def add_location(self, location):
         location["created_at"] = self.get_timestamp()
         location["updated_at"] = self.get_timestamp()
-        self.data.append(location)
+        self.put_record(location["id"], location)
 
     def update_location(self, location_id, location):
         location["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == location_id:
-                self.data[i] = location
-                break
+        if location_id in self.data:
+            self.put_record(location_id, location)
 
     def remove_location(self, location_id):
-        for x in self.data:
-            if x["id"] == location_id:
-                self.data.remove(x)
+        self.drop_record(location_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = LOCATIONS
+            self.load_records(LOCATIONS)
+        elif self.storage == "sqlite":
+            self.load_database()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
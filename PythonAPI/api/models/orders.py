@@ -1,5 +1,3 @@
-import json
-
 from models.base import Base
 from providers import data_provider
 
@@ -7,50 +5,48 @@ ORDERS = []
 
 
 class Orders(Base):
-    def __init__(self, root_path, is_debug=False):
+    indexes = ["ship_to", "bill_to", "shipment_id", "warehouse_id", "order_status"]
+
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "orders.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_orders(self):
-        return self.data
+        return list(self.data.values())
 
     def get_order(self, order_id):
-        for x in self.data:
-            if x["id"] == order_id:
-                return x
-        return None
+        return self.data.get(order_id)
 
     def get_items_in_order(self, order_id):
-        for x in self.data:
-            if x["id"] == order_id:
-                return x["items"]
-        return None
+        order = self.data.get(order_id)
+        if order is None:
+            return None
+        return order["items"]
 
     def get_orders_in_shipment(self, shipment_id):
         result = []
-        for x in self.data:
-            if x["shipment_id"] == shipment_id:
-                result.append(x["id"])
+        for x in self.find_records("shipment_id", shipment_id):
+            result.append(x["id"])
         return result
 
     def get_orders_for_client(self, client_id):
-        result = []
-        for x in self.data:
-            if x["ship_to"] == client_id or x["bill_to"] == client_id:
-                result.append(x)
-        return result
+        result = {}
+        for x in self.find_records("ship_to", client_id):
+            result[x["id"]] = x
+        for x in self.find_records("bill_to", client_id):
+            result[x["id"]] = x
+        return list(result.values())
 
     def add_order(self, order):
         order["created_at"] = self.get_timestamp()
         order["updated_at"] = self.get_timestamp()
-        self.data.append(order)
+        self.put_record(order["id"], order)
 
     def update_order(self, order_id, order):
         order["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == order_id:
-                self.data[i] = order
-                break
+        if order_id in self.data:
+            self.put_record(order_id, order)
 
     def update_items_in_order(self, order_id, items):
         order = self.get_order(order_id)
@@ -103,19 +99,13 @@ class Orders(Base):
             self.update_order(x, order)
 
     def remove_order(self, order_id):
-        for x in self.data:
-            if x["id"] == order_id:
-                self.data.remove(x)
+        self.drop_record(order_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = ORDERS
+            self.load_records(ORDERS)
+        elif self.storage == "sqlite":
+            self.load_database()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
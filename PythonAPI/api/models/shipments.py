@@ -1,5 +1,3 @@
-import json
-
 from models.base import Base
 from providers import data_provider
 
@@ -7,36 +5,32 @@ SHIPMENTS = []
 
 
 class Shipments(Base):
-    def __init__(self, root_path, is_debug=False):
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "shipments.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_shipments(self):
-        return self.data
+        return list(self.data.values())
 
     def get_shipment(self, shipment_id):
-        for x in self.data:
-            if x["id"] == shipment_id:
-                return x
-        return None
+        return self.data.get(shipment_id)
 
     def get_items_in_shipment(self, shipment_id):
-        for x in self.data:
-            if x["id"] == shipment_id:
-                return x["items"]
-        return None
+        shipment = self.data.get(shipment_id)
+        if shipment is None:
+            return None
+        return shipment["items"]
 
     def add_shipment(self, shipment):
         shipment["created_at"] = self.get_timestamp()
         shipment["updated_at"] = self.get_timestamp()
-        self.data.append(shipment)
+        self.put_record(shipment["id"], shipment)
 
     def update_shipment(self, shipment_id, shipment):
         shipment["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == shipment_id:
-                self.data[i] = shipment
-                break
+        if shipment_id in self.data:
+            self.put_record(shipment_id, shipment)
 
     def update_items_in_shipment(self, shipment_id, items):
         shipment = self.get_shipment(shipment_id)
@@ -75,19 +69,13 @@ class Shipments(Base):
         self.update_shipment(shipment_id, shipment)
 
     def remove_shipment(self, shipment_id):
-        for x in self.data:
-            if x["id"] == shipment_id:
-                self.data.remove(x)
+        self.drop_record(shipment_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = SHIPMENTS
+            self.load_records(SHIPMENTS)
+        elif self.storage == "sqlite":
+            self.load_database()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
@@ -1,50 +1,40 @@
-import json
-
 from models.base import Base
 
 SUPPLIERS = []
 
 
 class Suppliers(Base):
-    def __init__(self, root_path, is_debug=False):
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "suppliers.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_suppliers(self):
-        return self.data
+        return list(self.data.values())
 
     def get_supplier(self, supplier_id):
-        for x in self.data:
-            if x["id"] == supplier_id:
-                return x
-        return None
+        return self.data.get(supplier_id)
 
     def add_supplier(self, supplier):
         supplier["created_at"] = self.get_timestamp()
         supplier["updated_at"] = self.get_timestamp()
-        self.data.append(supplier)
+        self.put_record(supplier["id"], supplier)
 
     def update_supplier(self, supplier_id, supplier):
         supplier["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == supplier_id:
-                self.data[i] = supplier
-                break
+        if supplier_id in self.data:
+            self.put_record(supplier_id, supplier)
 
     def remove_supplier(self, supplier_id):
-        for x in self.data:
-            if x["id"] == supplier_id:
-                self.data.remove(x)
+        self.drop_record(supplier_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = SUPPLIERS
+            self.load_records(SUPPLIERS)
+        elif self.storage == "sqlite":
+            self.load_database()
+        elif self.storage == "mapped":
+            self.load_mapped()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
@@ -1,57 +1,45 @@
-import json
-
 from models.base import Base
 
 TRANSFERS = []
 
 
 class Transfers(Base):
-    def __init__(self, root_path, is_debug=False):
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "transfers.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_transfers(self):
-        return self.data
+        return list(self.data.values())
 
     def get_transfer(self, transfer_id):
-        for x in self.data:
-            if x["id"] == transfer_id:
-                return x
-        return None
+        return self.data.get(transfer_id)
 
     def get_items_in_transfer(self, transfer_id):
-        for x in self.data:
-            if x["id"] == transfer_id:
-                return x["items"]
-        return None
+        transfer = self.data.get(transfer_id)
+        if transfer is None:
+            return None
+        return transfer["items"]
 
     def add_transfer(self, transfer):
         transfer["transfer_status"] = "Scheduled"
         transfer["created_at"] = self.get_timestamp()
         transfer["updated_at"] = self.get_timestamp()
-        self.data.append(transfer)
+        self.put_record(transfer["id"], transfer)
 
     def update_transfer(self, transfer_id, transfer):
         transfer["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == transfer_id:
-                self.data[i] = transfer
-                break
+        if transfer_id in self.data:
+            self.put_record(transfer_id, transfer)
 
     def remove_transfer(self, transfer_id):
-        for x in self.data:
-            if x["id"] == transfer_id:
-                self.data.remove(x)
+        self.drop_record(transfer_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = TRANSFERS
+            self.load_records(TRANSFERS)
+        elif self.storage == "sqlite":
+            self.load_database()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
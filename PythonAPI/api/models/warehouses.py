@@ -1,50 +1,40 @@
-import json
-
 from models.base import Base
 
 WAREHOUSES = []
 
 
 class Warehouses(Base):
-    def __init__(self, root_path, is_debug=False):
+    def __init__(self, root_path, is_debug=False, storage="json"):
         self.data_path = root_path + "warehouses.json"
+        self.storage = storage
         self.load(is_debug)
 
     def get_warehouses(self):
-        return self.data
+        return list(self.data.values())
 
     def get_warehouse(self, warehouse_id):
-        for x in self.data:
-            if x["id"] == warehouse_id:
-                return x
-        return None
+        return self.data.get(warehouse_id)
 
     def add_warehouse(self, warehouse):
         warehouse["created_at"] = self.get_timestamp()
         warehouse["updated_at"] = self.get_timestamp()
-        self.data.append(warehouse)
+        self.put_record(warehouse["id"], warehouse)
 
     def update_warehouse(self, warehouse_id, warehouse):
         warehouse["updated_at"] = self.get_timestamp()
-        for i in range(len(self.data)):
-            if self.data[i]["id"] == warehouse_id:
-                self.data[i] = warehouse
-                break
+        if warehouse_id in self.data:
+            self.put_record(warehouse_id, warehouse)
 
     def remove_warehouse(self, warehouse_id):
-        for x in self.data:
-            if x["id"] == warehouse_id:
-                self.data.remove(x)
+        self.drop_record(warehouse_id)
 
     def load(self, is_debug):
         if is_debug:
-            self.data = WAREHOUSES
+            self.load_records(WAREHOUSES)
+        elif self.storage == "sqlite":
+            self.load_database()
+        elif self.storage == "mapped":
+            self.load_mapped()
         else:
-            f = open(self.data_path, "r")
-            self.data = json.load(f)
-            f.close()
-
-    def save(self):
-        f = open(self.data_path, "w")
-        json.dump(self.data, f)
-        f.close()
+            self.load_records(self.read_records())
+            self.replay_journal()
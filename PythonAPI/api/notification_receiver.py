@@ -0,0 +1,45 @@
+import http.server
+import json
+import random
+import sys
+
+# A stand-in webhook for trying out notification delivery locally. It
+# prints every batch it receives and can fail a share of the requests to
+# exercise the retries:
+#     python api/notification_receiver.py [port] [failure rate]
+# and start the server with NOTIFICATION_SINKS=http://localhost:<port>/
+
+FAILURE_RATE = 0.0
+
+
+class ReceiverRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        body = self.rfile.read(length)
+        if random.random() < FAILURE_RATE:
+            self.send_response(503)
+            self.end_headers()
+            return
+        try:
+            notifications = json.loads(body)["notifications"]
+        except (ValueError, KeyError, TypeError):
+            self.send_response(400)
+            self.end_headers()
+            return
+        for notification in notifications:
+            print(f"{notification['time']:.3f} {notification['message']} (x{notification['count']})")
+        sys.stdout.flush()
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 3001
+    if len(sys.argv) > 2:
+        FAILURE_RATE = float(sys.argv[2])
+    server = http.server.ThreadingHTTPServer(("", port), ReceiverRequestHandler)
+    print(f"Receiving notifications on port {port}...")
+    server.serve_forever()
@@ -0,0 +1,92 @@
+import json
+
+from providers import data_provider
+
+# Resource name -> the singular used by the pool's add_/update_/remove_ methods.
+RESOURCES = {
+    "warehouses": "warehouse",
+    "locations": "location",
+    "transfers": "transfer",
+    "items": "item",
+    "item_lines": "item_line",
+    "item_groups": "item_group",
+    "item_types": "item_type",
+    "inventories": "inventory",
+    "suppliers": "supplier",
+    "orders": "order",
+    "clients": "client",
+    "shipments": "shipment",
+}
+
+
+def parse_body(body):
+    # A JSON array, or NDJSON with one record per line. A line that doesn't
+    # parse is kept as an error so the rest of the batch still goes through.
+    text = body.decode("utf-8")
+    if text.lstrip().startswith("["):
+        try:
+            return json.loads(text)
+        except ValueError:
+            # NDJSON whose first record is an array.
+            pass
+    records = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError as e:
+            records.append(ValueError(f"invalid JSON: {e}"))
+    return records
+
+
+def get_key(pool, record):
+    if isinstance(record, dict):
+        record = record.get(pool.key)
+    if record is None:
+        raise ValueError(f"missing {pool.key}")
+    return pool.coerce_key(record)
+
+
+def apply(resource, method, records):
+    # Applies every record, then saves the pool once. Each record gets its
+    # own result; a failing record doesn't stop the others.
+    pool = data_provider.fetch_pool(resource)
+    name = RESOURCES[resource]
+    add = getattr(pool, "add_" + name)
+    update = getattr(pool, "update_" + name)
+    remove = getattr(pool, "remove_" + name)
+    results = []
+    for index, record in enumerate(records):
+        result = {"index": index}
+        try:
+            if isinstance(record, Exception):
+                raise record
+            # Deletes also take bare keys; anything else has to be an object
+            # before a key is read from it.
+            if method != "delete" and not isinstance(record, dict):
+                raise ValueError("record must be an object")
+            key = get_key(pool, record)
+            result[pool.key] = key
+            if method == "delete":
+                if key not in pool.data:
+                    result["status"] = 404
+                else:
+                    remove(key)
+                    result["status"] = 200
+            elif method == "post":
+                record[pool.key] = key
+                add(record)
+                result["status"] = 201
+            elif key not in pool.data:
+                result["status"] = 404
+            else:
+                record[pool.key] = key
+                update(key, record)
+                result["status"] = 200
+        except (ValueError, TypeError, KeyError) as e:
+            result["status"] = 400
+            result["error"] = str(e)
+        results.append(result)
+    pool.save()
+    return results
@@ -0,0 +1,120 @@
+import json
+import os
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+
+from providers import data_provider
+
+# Open /events streams are written without holding a request worker (see
+# servers/event_writer.py and AsyncServer.stream_events); the cap only
+# bounds the connections and queued events they can hold on to.
+EVENT_MAX_SUBSCRIBERS = int(os.environ.get("EVENT_MAX_SUBSCRIBERS", "500"))
+SUBSCRIBER_QUEUE_SIZE = 1000
+EVENT_HISTORY_SIZE = 1000
+EVENT_HEARTBEAT_SEC = 15
+# A client that leaves this much unread is dropped like one whose queue
+# overflowed.
+EVENT_MAX_PENDING_BYTES = 1 << 20
+
+RETRY = b"retry: 3000\n\n"
+# Comment lines keep proxies from timing out an idle stream.
+KEEP_ALIVE = b": keep-alive\n\n"
+
+_subscribers = []
+_history = deque(maxlen=EVENT_HISTORY_SIZE)
+_sequence = 0
+_lock = threading.Lock()
+
+
+class Subscriber:
+    def __init__(self, types):
+        self.types = types
+        self.queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+        # Set by whoever writes the stream; called from the publishing
+        # thread whenever there is something new to write.
+        self.wakeup = None
+
+    def wants(self, event):
+        if self.types is None:
+            return True
+        for prefix in self.types:
+            if event["type"].startswith(prefix):
+                return True
+        return False
+
+    def offer(self, event):
+        # A subscriber that falls a whole queue behind is closed rather
+        # than slowing down publishers; it can reconnect with Last-Event-ID
+        # and catch up from the history.
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.closed = True
+        if self.wakeup is not None:
+            self.wakeup()
+
+    def read(self):
+        # Everything queued so far as SSE frames, without waiting.
+        parts = []
+        while True:
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            parts.append(f"id: {event['id']}\nevent: {event['type']}\ndata: {event['message']}\n\n".encode("utf-8"))
+        return b"".join(parts)
+
+
+def init():
+    data_provider.add_listener(publish_change)
+
+
+def publish(event_type, data):
+    # The event is serialised right away: data may hold a pool's stored
+    # record, which later writes change in place. Change events are
+    # published under the write lock, so this is the state they report.
+    global _sequence
+    with _lock:
+        _sequence += 1
+        message = {"id": _sequence, "type": event_type, "time": datetime.utcnow().isoformat() + "Z", "data": data}
+        event = {"id": _sequence, "type": event_type, "message": json.dumps(message)}
+        _history.append(event)
+        for subscriber in _subscribers:
+            if not subscriber.closed and subscriber.wants(event):
+                subscriber.offer(event)
+    return event
+
+
+def publish_change(pool, op, key, record):
+    name = pool.get_name()
+    if op == "put":
+        publish(f"{name}.changed", {pool.key: key, "record": record})
+    else:
+        publish(f"{name}.removed", {pool.key: key})
+
+
+def subscribe(types=None, last_event_id=None):
+    with _lock:
+        if len(_subscribers) >= EVENT_MAX_SUBSCRIBERS:
+            return None
+        subscriber = Subscriber(types)
+        if last_event_id is not None and last_event_id <= _sequence:
+            for event in _history:
+                if event["id"] > last_event_id and subscriber.wants(event):
+                    subscriber.offer(event)
+        _subscribers.append(subscriber)
+        return subscriber
+
+
+def unsubscribe(subscriber):
+    with _lock:
+        if subscriber in _subscribers:
+            _subscribers.remove(subscriber)
+
+
+def get_metrics():
+    with _lock:
+        return {"subscribers": len(_subscribers), "last_event_id": _sequence}
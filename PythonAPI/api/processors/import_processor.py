@@ -0,0 +1,81 @@
+import json
+
+from providers import data_provider
+from processors import bulk_processor
+
+IMPORT_BATCH_SIZE = 1000
+MAX_LINE_BYTES = 1024 * 1024
+MAX_REPORTED_ERRORS = 100
+
+
+def read_lines(stream, length=None):
+    # Yields the lines of an NDJSON stream one at a time, never reading more
+    # than MAX_LINE_BYTES at once; a longer line is skipped and yielded as
+    # None. With a length only that many bytes are read, so a keep-alive
+    # connection is left at the start of the next request.
+    remaining = length
+    while remaining is None or remaining > 0:
+        line = read_line(stream, remaining)
+        if not line:
+            return
+        if remaining is not None:
+            remaining -= len(line)
+        if len(line) <= MAX_LINE_BYTES:
+            yield line
+            continue
+        while line and not line.endswith(b"\n") and (remaining is None or remaining > 0):
+            line = read_line(stream, remaining)
+            if remaining is not None:
+                remaining -= len(line)
+        yield None
+
+
+def read_line(stream, remaining):
+    limit = MAX_LINE_BYTES + 1
+    if remaining is not None:
+        limit = min(limit, remaining)
+    return stream.readline(limit)
+
+
+def import_lines(resource, lines):
+    # Records are validated as they are read and added in batches of
+    # IMPORT_BATCH_SIZE. Each batch takes the write lock and is saved on its
+    # own, so readers get in between batches and only one batch of records
+    # is held here at a time.
+    pool = data_provider.fetch_pool(resource)
+    add = getattr(pool, "add_" + bulk_processor.RESOURCES[resource])
+    report = {"imported": 0, "failed": 0, "batches": 0, "errors": []}
+    batch = []
+    number = 0
+    for line in lines:
+        number += 1
+        try:
+            if line is None:
+                raise ValueError(f"line longer than {MAX_LINE_BYTES} bytes")
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("record must be an object")
+            record[pool.key] = bulk_processor.get_key(pool, record)
+        except (ValueError, TypeError) as e:
+            report["failed"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": number, "error": str(e)})
+            continue
+        batch.append(record)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            commit_batch(pool, add, batch, report)
+            batch = []
+    if batch:
+        commit_batch(pool, add, batch, report)
+    return report
+
+
+def commit_batch(pool, add, batch, report):
+    with data_provider.write_lock():
+        for record in batch:
+            add(record)
+        pool.save()
+    report["imported"] += len(batch)
+    report["batches"] += 1
@@ -1,18 +1,112 @@
+import os
 import threading
+import time
+from collections import deque
 
-NOTIFICATION_UPDATE_INTERVAL_SEC = 30
+from processors import event_processor
+from processors import notification_sinks
+
+# Notifications are queued by the request threads and delivered in batches
+# by one worker thread. The queue is bounded: when it is full the policy
+# decides what gives way.
+#   drop_oldest  - the oldest queued notification is discarded (default)
+#   drop_newest  - the new notification is discarded
+#   coalesce     - a notification identical to one still queued only bumps
+#                  that one's count; otherwise the oldest is discarded
+NOTIFICATION_QUEUE_SIZE = int(os.environ.get("NOTIFICATION_QUEUE_SIZE", "10000"))
+NOTIFICATION_POLICY = os.environ.get("NOTIFICATION_POLICY", "drop_oldest")
+NOTIFICATION_BATCH_SIZE = int(os.environ.get("NOTIFICATION_BATCH_SIZE", "100"))
+# How long the worker lets a burst build up before draining it.
+NOTIFICATION_LINGER_SEC = float(os.environ.get("NOTIFICATION_LINGER_SEC", "0.05"))
+
+_queue = deque()
+_pending = {}
+_condition = threading.Condition()
+_worker = None
+_sinks = []
+_metrics = {"pushed": 0, "delivered": 0, "dropped": 0, "coalesced": 0, "batches": 0, "max_depth": 0, "last_lag": 0.0}
 
-_queue = ["Dummy message"]
 
 def push(notification):
-    global _queue
-    _queue.append(notification)
+    event_processor.publish("notification", {"message": notification})
+    with _condition:
+        _metrics["pushed"] += 1
+        if NOTIFICATION_POLICY == "coalesce" and notification in _pending:
+            _pending[notification]["count"] += 1
+            _metrics["coalesced"] += 1
+            return
+        if len(_queue) >= NOTIFICATION_QUEUE_SIZE:
+            _metrics["dropped"] += 1
+            if NOTIFICATION_POLICY == "drop_newest":
+                return
+            forget(_queue.popleft())
+        entry = {"message": notification, "time": time.time(), "count": 1}
+        _queue.append(entry)
+        _pending[notification] = entry
+        if len(_queue) > _metrics["max_depth"]:
+            _metrics["max_depth"] = len(_queue)
+        _condition.notify()
+
+
+def forget(entry):
+    if _pending.get(entry["message"]) is entry:
+        del _pending[entry["message"]]
+
+
+def take_batch():
+    with _condition:
+        while not _queue:
+            _condition.wait()
+    # Let the rest of a burst (a batch transfer commit, a bulk request)
+    # arrive so it goes out together.
+    time.sleep(NOTIFICATION_LINGER_SEC)
+    batch = []
+    with _condition:
+        while _queue and len(batch) < NOTIFICATION_BATCH_SIZE:
+            entry = _queue.popleft()
+            forget(entry)
+            batch.append(entry)
+    return batch
+
+
+def deliver(batch):
+    # Only hands the batch to the sinks; their own workers do the sending.
+    for sink in _sinks:
+        sink.enqueue(batch)
+
+
+def run():
+    while True:
+        batch = take_batch()
+        try:
+            deliver(batch)
+        except Exception as e:
+            print(f"Delivering notifications failed: {e}")
+        with _condition:
+            _metrics["delivered"] += len(batch)
+            _metrics["batches"] += 1
+            _metrics["last_lag"] = round(time.time() - batch[0]["time"], 3)
+
+
+def get_metrics():
+    # depth is what is still queued and lag the age of the oldest of it;
+    # last_lag is how long the last delivered batch had waited.
+    with _condition:
+        metrics = dict(_metrics)
+        metrics["depth"] = len(_queue)
+        metrics["lag"] = round(time.time() - _queue[0]["time"], 3) if _queue else 0.0
+    sinks = {}
+    for sink in _sinks:
+        sinks[sink.target] = sink.get_metrics()
+    metrics["sinks"] = sinks
+    return metrics
 
-def send():
-    if len(_queue) > 0:
-        notification = _queue.pop(0)
-        print(notification)
-    threading.Timer(NOTIFICATION_UPDATE_INTERVAL_SEC, send).start()
 
 def start():
-    send()
+    global _worker, _sinks
+    if _worker is None:
+        _sinks = notification_sinks.create_sinks()
+        for sink in _sinks:
+            sink.start()
+        _worker = threading.Thread(target=run, daemon=True)
+        _worker.start()
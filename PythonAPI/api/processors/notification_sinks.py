@@ -0,0 +1,227 @@
+import abc
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+
+# Sinks are configured as a comma separated list of targets:
+#     stdout                  - print (the default)
+#     file:<path>             - append NDJSON lines to a file
+#     http://host:port/path   - POST each batch as JSON to a webhook
+#     udp://host:port         - one syslog style datagram per notification
+#     tcp://host:port         - one syslog style line per notification
+NOTIFICATION_SINKS = os.environ.get("NOTIFICATION_SINKS", "stdout")
+NOTIFICATION_OUTBOX_PATH = os.environ.get("NOTIFICATION_OUTBOX_PATH", "./data/outbox/")
+NOTIFICATION_SINK_BATCH_SIZE = int(os.environ.get("NOTIFICATION_SINK_BATCH_SIZE", "100"))
+NOTIFICATION_SINK_BACKLOG = int(os.environ.get("NOTIFICATION_SINK_BACKLOG", "10000"))
+NOTIFICATION_SINK_TIMEOUT_SEC = float(os.environ.get("NOTIFICATION_SINK_TIMEOUT_SEC", "5"))
+# Failed deliveries are retried after 0.5, 1, 2, 4, ... seconds (at most
+# RETRY_MAX_SEC apart); after MAX_ATTEMPTS the batch is given up.
+NOTIFICATION_RETRY_BASE_SEC = float(os.environ.get("NOTIFICATION_RETRY_BASE_SEC", "0.5"))
+NOTIFICATION_RETRY_MAX_SEC = float(os.environ.get("NOTIFICATION_RETRY_MAX_SEC", "60"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get("NOTIFICATION_MAX_ATTEMPTS", "10"))
+
+# Syslog priority 14: facility user, severity info.
+SYSLOG_PREFIX = "<14>cargohub: "
+
+
+class Sink(abc.ABC):
+    # Every sink has its own backlog and worker thread, so a slow or
+    # unreachable target only holds up its own deliveries. The backlog is
+    # mirrored in an outbox file and picked up again after a restart.
+
+    persistent = True
+
+    def __init__(self, target):
+        self.target = target
+        self.name = re.sub(r"[^0-9A-Za-z]+", "_", target).strip("_")
+        self.backlog = deque()
+        self.condition = threading.Condition()
+        self.outbox_path = NOTIFICATION_OUTBOX_PATH + self.name + ".ndjson"
+        self.metrics = {"delivered": 0, "failures": 0, "dropped": 0, "given_up": 0}
+        self.worker = None
+
+    @abc.abstractmethod
+    def send(self, entries):
+        pass
+
+    def load_outbox(self):
+        if not self.persistent or not os.path.exists(self.outbox_path):
+            return
+        f = open(self.outbox_path, "r")
+        for line in f:
+            if line.strip():
+                self.backlog.append(json.loads(line))
+        f.close()
+
+    def write_outbox(self):
+        if not self.persistent:
+            return
+        tmp_path = self.outbox_path + ".tmp"
+        f = open(tmp_path, "w")
+        for entry in self.backlog:
+            f.write(json.dumps(entry) + "\n")
+        f.close()
+        os.replace(tmp_path, self.outbox_path)
+
+    def enqueue(self, entries):
+        with self.condition:
+            dropped = False
+            for entry in entries:
+                if len(self.backlog) >= NOTIFICATION_SINK_BACKLOG:
+                    self.backlog.popleft()
+                    self.metrics["dropped"] += 1
+                    dropped = True
+                self.backlog.append(entry)
+            if self.persistent:
+                if dropped:
+                    self.write_outbox()
+                else:
+                    f = open(self.outbox_path, "a")
+                    for entry in entries:
+                        f.write(json.dumps(entry) + "\n")
+                    f.close()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.backlog:
+                    self.condition.wait()
+                batch = []
+                for entry in self.backlog:
+                    if len(batch) >= NOTIFICATION_SINK_BATCH_SIZE:
+                        break
+                    batch.append(entry)
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    self.send(batch)
+                    self.metrics["delivered"] += len(batch)
+                    break
+                except Exception as e:
+                    self.metrics["failures"] += 1
+                    if attempt >= NOTIFICATION_MAX_ATTEMPTS:
+                        print(f"Giving up on {len(batch)} notifications for {self.target}: {e}")
+                        self.metrics["given_up"] += len(batch)
+                        break
+                    time.sleep(min(NOTIFICATION_RETRY_BASE_SEC * 2 ** (attempt - 1), NOTIFICATION_RETRY_MAX_SEC))
+            with self.condition:
+                # The backlog may have lost its head to the backlog limit
+                # while the batch was out.
+                for entry in batch:
+                    if self.backlog and self.backlog[0] is entry:
+                        self.backlog.popleft()
+                self.write_outbox()
+
+    def start(self):
+        if self.persistent:
+            os.makedirs(NOTIFICATION_OUTBOX_PATH, exist_ok=True)
+            self.load_outbox()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def get_metrics(self):
+        with self.condition:
+            metrics = dict(self.metrics)
+            metrics["backlog"] = len(self.backlog)
+        return metrics
+
+
+class StdoutSink(Sink):
+    persistent = False
+
+    def send(self, entries):
+        for entry in entries:
+            if entry["count"] > 1:
+                print(f"{entry['message']} (x{entry['count']})")
+            else:
+                print(entry["message"])
+        sys.stdout.flush()
+
+
+class FileSink(Sink):
+    def __init__(self, target):
+        super().__init__(target)
+        self.path = target[len("file:"):]
+
+    def send(self, entries):
+        f = open(self.path, "a")
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.close()
+
+
+class WebhookSink(Sink):
+    def send(self, entries):
+        body = json.dumps({"notifications": entries}).encode("utf-8")
+        request = urllib.request.Request(self.target, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        # urlopen raises on anything but a 2xx/3xx answer.
+        response = urllib.request.urlopen(request, timeout=NOTIFICATION_SINK_TIMEOUT_SEC)
+        response.read()
+        response.close()
+
+
+class SocketSink(Sink):
+    def __init__(self, target):
+        super().__init__(target)
+        url = urllib.parse.urlsplit(target)
+        self.protocol = url.scheme
+        self.address = (url.hostname, url.port)
+        self.socket = None
+
+    def send(self, entries):
+        if self.protocol == "udp":
+            if self.socket is None:
+                self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            for entry in entries:
+                self.socket.sendto(format_line(entry), self.address)
+            return
+        if self.socket is None:
+            self.socket = socket.create_connection(self.address, NOTIFICATION_SINK_TIMEOUT_SEC)
+        data = b""
+        for entry in entries:
+            data += format_line(entry)
+        try:
+            self.socket.sendall(data)
+        except OSError:
+            # Reconnect on the next attempt.
+            self.socket.close()
+            self.socket = None
+            raise
+
+
+def format_line(entry):
+    message = entry["message"]
+    if entry["count"] > 1:
+        message += f" (x{entry['count']})"
+    return (SYSLOG_PREFIX + message + "\n").encode("utf-8")
+
+
+def create_sink(target):
+    if target == "stdout":
+        return StdoutSink(target)
+    if target.startswith("file:"):
+        return FileSink(target)
+    if target.startswith("http://") or target.startswith("https://"):
+        return WebhookSink(target)
+    if target.startswith("udp://") or target.startswith("tcp://"):
+        return SocketSink(target)
+    raise ValueError(f"unknown notification sink: {target}")
+
+
+def create_sinks():
+    sinks = []
+    for target in NOTIFICATION_SINKS.split(","):
+        target = target.strip()
+        if target:
+            sinks.append(create_sink(target))
+    return sinks
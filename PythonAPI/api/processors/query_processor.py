@@ -0,0 +1,135 @@
+import bisect
+import json
+
+# Query string parameters that aren't filters.
+RESERVED = ["limit", "offset", "cursor", "stream", "fields"]
+
+# field=value tests equality; field.in=a,b any of a list; field.gt, .gte, .lt
+# and .lte compare numbers and timestamps (created_at, updated_at, ...).
+OPERATORS = ["in", "gt", "gte", "lt", "lte"]
+
+
+def parse_filters(query):
+    filters = []
+    for name, values in query.items():
+        if name in RESERVED:
+            continue
+        field, _, op = name.rpartition(".")
+        if not field or op not in OPERATORS:
+            field = name
+            op = "eq"
+        for value in values:
+            if op == "in":
+                filters.append((field, op, value.split(",")))
+            else:
+                filters.append((field, op, [value]))
+    return filters
+
+
+def parse_fields(query):
+    if "fields" not in query:
+        return None
+    fields = []
+    for value in query["fields"]:
+        for field in value.split(","):
+            if field:
+                fields.append(field)
+    return fields
+
+
+def candidates(value):
+    # Query values are strings; "5" also matches the number 5 and "true"
+    # the boolean, while "00123" still matches the string.
+    result = [value]
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        return result
+    if parsed is None or isinstance(parsed, (bool, int, float)):
+        result.append(parsed)
+    return result
+
+
+def compare(pool, actual, op, value):
+    if isinstance(actual, bool) or actual is None:
+        return False
+    if isinstance(actual, (int, float)):
+        expected = float(value)
+    else:
+        actual = pool.parse_timestamp(actual)
+        expected = pool.parse_timestamp(value)
+        if actual is None:
+            return False
+        if expected is None:
+            raise ValueError(f"not a timestamp: {value}")
+    if op == "gt":
+        return actual > expected
+    if op == "gte":
+        return actual >= expected
+    if op == "lt":
+        return actual < expected
+    return actual <= expected
+
+
+def matches(pool, record, filters):
+    for field, op, values in filters:
+        actual = record.get(field)
+        if op in ("eq", "in"):
+            # List fields (like locations) match when any element does.
+            elements = actual if isinstance(actual, list) else [actual]
+            found = False
+            for value in values:
+                for candidate in candidates(value):
+                    for element in elements:
+                        if element == candidate and type(element) is type(candidate):
+                            found = True
+            if not found:
+                return False
+        elif not compare(pool, actual, op, values[0]):
+            return False
+    return True
+
+
+def filter_records(pool, filters):
+    # Returns the matching keys in order and their records. An equality or
+    # "in" filter on an indexed field narrows the candidates through the
+    # index first; everything else is checked record by record.
+    records = None
+    for field, op, values in filters:
+        if op in ("eq", "in") and field in pool.indexes:
+            records = {}
+            for value in values:
+                for candidate in candidates(value):
+                    for record in pool.find_records(field, candidate):
+                        records[record[pool.key]] = record
+            break
+    if records is None:
+        keys = pool.get_page_keys()[0]
+        records = {}
+        for key in keys:
+            records[key] = pool.get_record(key)
+    matched = {}
+    for key in sorted(records):
+        record = records[key]
+        if record is not None and matches(pool, record, filters):
+            matched[key] = record
+    return matched
+
+
+def get_page(keys, limit, offset, cursor):
+    start = offset
+    if cursor is not None:
+        start += bisect.bisect_right(keys, cursor)
+    end = len(keys) if limit is None else min(start + limit, len(keys))
+    next_cursor = None
+    if end < len(keys) and end > start:
+        next_cursor = keys[end - 1]
+    return keys[start:end], len(keys), next_cursor
+
+
+def project(record, fields):
+    result = {}
+    for field in fields:
+        if field in record:
+            result[field] = record[field]
+    return result
@@ -0,0 +1,52 @@
+from providers import data_provider
+from processors import event_processor
+from processors import notification_processor
+
+
+def find_missing(transfer_ids):
+    transfers = data_provider.fetch_transfer_pool()
+    missing = []
+    for transfer_id in transfer_ids:
+        if transfers.get_transfer(transfer_id) is None:
+            missing.append(transfer_id)
+    return missing
+
+
+def commit_transfers(transfer_ids):
+    # Commits a batch of transfers: every inventory row involved is looked
+    # up once through the item_id index, all deltas are applied to working
+    # copies first and only then written back, and each pool is persisted
+    # once. Runs under the write lock, so readers never see half a batch.
+    transfer_pool = data_provider.fetch_transfer_pool()
+    inventory_pool = data_provider.fetch_inventory_pool()
+    transfers = []
+    for transfer_id in dict.fromkeys(transfer_ids):
+        transfers.append(transfer_pool.get_transfer(transfer_id))
+    rows = {}
+    for transfer in transfers:
+        for x in transfer["items"]:
+            if x["item_id"] not in rows:
+                rows[x["item_id"]] = [dict(y) for y in inventory_pool.get_inventories_for_item(x["item_id"])]
+    changed = {}
+    for transfer in transfers:
+        for x in transfer["items"]:
+            for y in rows[x["item_id"]]:
+                if y.get("location_id") == transfer["transfer_from"]:
+                    y["total_on_hand"] -= x["amount"]
+                elif y.get("location_id") == transfer["transfer_to"]:
+                    y["total_on_hand"] += x["amount"]
+                else:
+                    continue
+                y["total_expected"] = y["total_on_hand"] + y["total_ordered"]
+                y["total_available"] = y["total_on_hand"] - y["total_allocated"]
+                changed[y["id"]] = y
+    for inventory_id, inventory in changed.items():
+        inventory_pool.update_inventory(inventory_id, inventory)
+    for transfer in transfers:
+        transfer["transfer_status"] = "Processed"
+        transfer_pool.update_transfer(transfer["id"], transfer)
+        notification_processor.push(f"Processed batch transfer with id:{transfer['id']}")
+        event_processor.publish("transfers.processed", {"id": transfer["id"]})
+    transfer_pool.save()
+    inventory_pool.save()
+    return list(changed)
@@ -0,0 +1,107 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+from providers import data_provider
+
+CACHE_MAX_ENTRIES = 1024
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_ROUTES = 8192
+
+# Pool versions restart at zero on every boot; the boot id keeps an ETag from
+# a previous process from matching a different body now.
+_boot_id = uuid.uuid4().hex[:8]
+
+_entries = OrderedDict()
+_routes = {}
+_route_pools = OrderedDict()
+_size = 0
+_lock = threading.Lock()
+
+
+def init():
+    data_provider.add_listener(invalidate)
+
+
+def get_boot_id():
+    return _boot_id
+
+
+def make_etag(pools):
+    parts = [_boot_id]
+    for pool in sorted(pools, key=lambda x: x.get_name()):
+        parts.append(f"{pool.get_name()}.{pool.version}")
+    return '"' + "-".join(parts) + '"'
+
+
+def get_last_modified(pools):
+    last_modified = None
+    for pool in pools:
+        if pool.last_modified is not None and (last_modified is None or pool.last_modified > last_modified):
+            last_modified = pool.last_modified
+    return last_modified
+
+
+def get_validators(route):
+    # The pools a route read from the last time it was served are remembered
+    # past eviction, so a conditional GET can be answered from the current
+    # pool versions without running the handler.
+    with _lock:
+        names = _route_pools.get(route)
+    if names is None:
+        return None
+    pools = []
+    for name in names:
+        pools.append(data_provider.fetch_pool(name))
+    return make_etag(pools), get_last_modified(pools)
+
+
+def get(route):
+    with _lock:
+        entry = _entries.get(route)
+        if entry is not None:
+            _entries.move_to_end(route)
+        return entry
+
+
+def put(route, pools, body, headers):
+    global _size
+    etag = make_etag(pools)
+    last_modified = get_last_modified(pools)
+    names = []
+    for pool in pools:
+        names.append(pool.get_name())
+    with _lock:
+        _route_pools[route] = names
+        _route_pools.move_to_end(route)
+        if len(_route_pools) > CACHE_MAX_ROUTES:
+            _route_pools.popitem(last=False)
+    if len(body) > CACHE_MAX_BYTES:
+        return etag, last_modified
+    with _lock:
+        remove(route)
+        for name in names:
+            _routes.setdefault(name, set()).add(route)
+        _entries[route] = {"body": body, "etag": etag, "last_modified": last_modified, "headers": headers, "pools": names}
+        _size += len(body)
+        while len(_entries) > CACHE_MAX_ENTRIES or _size > CACHE_MAX_BYTES:
+            remove(next(iter(_entries)))
+    return etag, last_modified
+
+
+def remove(route):
+    global _size
+    entry = _entries.pop(route, None)
+    if entry is None:
+        return
+    _size -= len(entry["body"])
+    for name in entry["pools"]:
+        routes = _routes.get(name)
+        if routes is not None:
+            routes.discard(route)
+
+
+def invalidate(pool, op=None, key=None, record=None):
+    with _lock:
+        for route in list(_routes.pop(pool.get_name(), ())):
+            remove(route)
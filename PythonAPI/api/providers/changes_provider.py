@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+
+from providers import cache_provider
+from providers import data_provider
+
+# Distinct keys remembered per pool. Tokens older than the oldest dropped
+# change can't be answered and get a 410, which means "sync from scratch".
+CHANGE_LOG_MAX_ENTRIES = 100000
+CHANGES_DEFAULT_LIMIT = 1000
+
+# Per pool name: key -> (sequence, op), oldest change first. A key that
+# changes again moves to the end, so the log holds the latest change per
+# key and its size is bounded by the number of keys touched.
+_logs = {}
+_floors = {}
+_lock = threading.Lock()
+
+
+class ExpiredToken(Exception):
+    pass
+
+
+def init():
+    data_provider.add_listener(log_change)
+
+
+def log_change(pool, op, key, record=None):
+    # Pool versions are bumped before listeners run, so the version is the
+    # sequence number of this change.
+    name = pool.get_name()
+    with _lock:
+        log = _logs.setdefault(name, OrderedDict())
+        log[key] = (pool.version, op)
+        log.move_to_end(key)
+        if len(log) > CHANGE_LOG_MAX_ENTRIES:
+            _floors[name] = log.popitem(last=False)[1][0]
+
+
+def make_token(sequence, cursor=None):
+    # The pool versions restart with every process; the boot id tells the
+    # tokens of an earlier process apart. During the first sync the token
+    # also carries the last key sent.
+    token = f"{cache_provider.get_boot_id()}.{sequence}"
+    if cursor is not None:
+        token += f".{cursor}"
+    return token
+
+
+def parse_token(pool, token):
+    boot_id, _, rest = token.partition(".")
+    if boot_id != cache_provider.get_boot_id():
+        raise ExpiredToken(token)
+    sequence, dot, cursor = rest.partition(".")
+    if not dot:
+        return int(sequence), None
+    return int(sequence), pool.key_type(cursor)
+
+
+def list_records(pool, sequence, cursor, limit):
+    # The first sync pages through the pool in key order. Its tokens keep
+    # the version the sync started at, and the last page hands over to the
+    # change log from there, so writes made while paging still come
+    # through afterwards.
+    keys, total, next_cursor = pool.get_page_keys(limit, 0, cursor)
+    changes = []
+    for key in keys:
+        value = pool.get_record(key)
+        if value is not None:
+            changes.append({"op": "put", pool.key: key, "record": value})
+    if next_cursor is None:
+        return changes, make_token(sequence), False
+    return changes, make_token(sequence, next_cursor), True
+
+
+def get_changes(pool, since, limit=CHANGES_DEFAULT_LIMIT):
+    # Returns (changes, next_token, more). Without a token every record is
+    # sent as a put, which is also how a client recovers from a 410.
+    name = pool.get_name()
+    if since is None:
+        return list_records(pool, pool.version, None, limit)
+    sequence, cursor = parse_token(pool, since)
+    with _lock:
+        if sequence < _floors.get(name, 0) or sequence > pool.version:
+            raise ExpiredToken(since)
+        if cursor is not None:
+            newer = None
+        else:
+            newer = []
+            for key, (changed, op) in reversed(_logs.get(name, {}).items()):
+                if changed <= sequence:
+                    break
+                newer.append((changed, op, key))
+    if newer is None:
+        return list_records(pool, sequence, cursor, limit)
+    newer.reverse()
+    more = len(newer) > limit
+    newer = newer[:limit]
+    changes = []
+    for changed, op, key in newer:
+        value = pool.get_record(key)
+        if op == "remove" or value is None:
+            changes.append({"op": "remove", pool.key: key})
+        else:
+            changes.append({"op": "put", pool.key: key, "record": value})
+    next_sequence = newer[-1][0] if more else pool.version
+    return changes, make_token(next_sequence), more
@@ -1,3 +1,11 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from providers import json_provider
+from storage import snapshot
+
 from models.warehouses import Warehouses
 from models.locations import Locations
 from models.transfers import Transfers
@@ -15,90 +23,280 @@ DEBUG = False
 
 ROOT_PATH = "./data/"
 
-_warehouses = None
-_locations = None
-_transfers = None
-_items = None
-_item_lines = None
-_item_groups = None
-_item_types = None
-_inventories = None
-_suppliers = None
-_orders = None
-_shipments = None
-_clients = None
+# "json" keeps the JSON files plus journal, "sqlite" stores every pool in
+# ROOT_PATH/cargohub.db (imported from the JSON files on first start).
+STORAGE = os.environ.get("STORAGE", "json")
+
+# Pools listed in READ_ONLY_POOLS (comma separated) are served from a
+# memory-mapped records file instead of being parsed into memory, and
+# reject writes. Only these pools support it.
+MAPPABLE_POOLS = ["clients", "suppliers", "warehouses"]
+READ_ONLY_POOLS = [x for x in os.environ.get("READ_ONLY_POOLS", "").split(",") if x in MAPPABLE_POOLS]
+
+JOURNAL_COMPACT_INTERVAL_SEC = 60
+
+# Pools are loaded on first access, so the server can start answering
+# before every JSON file is parsed. "background" also warms them up in a
+# thread after init(), "eager" loads them all inside init() and "parallel"
+# does the same but parses the JSON files in LOAD_WORKERS processes first.
+LOAD_MODE = os.environ.get("LOAD_MODE", "background")
+LOAD_WORKERS = int(os.environ.get("LOAD_WORKERS", str(os.cpu_count() or 1)))
+
+POOL_CLASSES = {
+    "warehouses": Warehouses,
+    "locations": Locations,
+    "transfers": Transfers,
+    "items": Items,
+    "item_lines": ItemLines,
+    "item_groups": ItemGroups,
+    "item_types": ItemTypes,
+    "inventories": Inventories,
+    "suppliers": Suppliers,
+    "orders": Orders,
+    "clients": Clients,
+    "shipments": Shipments,
+}
+
+_pools = {}
+_pool_locks = {}
+_load_times = {}
+
+class ReadWriteLock:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writing = False
+        self.waiting_writers = 0
+
+    def acquire_read(self):
+        with self.condition:
+            # Queued writers go first so a steady stream of GETs can't starve them.
+            while self.writing or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+
+    def release_read(self):
+        with self.condition:
+            self.readers -= 1
+            if self.readers == 0:
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writing or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writing = True
+
+    def release_write(self):
+        with self.condition:
+            self.writing = False
+            self.condition.notify_all()
+
+
+_lock = ReadWriteLock()
+
+_listeners = []
+
+_tracking = threading.local()
+
+
+@contextmanager
+def read_lock():
+    _lock.acquire_read()
+    try:
+        yield
+    finally:
+        _lock.release_read()
+
+
+@contextmanager
+def write_lock():
+    _lock.acquire_write()
+    try:
+        yield
+    finally:
+        _lock.release_write()
+
+
+def add_listener(listener):
+    _listeners.append(listener)
+    for pool in fetch_pools():
+        pool.add_listener(listener)
+
+
+def track_pools():
+    _tracking.pools = []
+
+
+def tracked_pools():
+    return getattr(_tracking, "pools", [])
+
+
+def track(pool):
+    # Records which pools a request read from, so cached responses can be
+    # tied to the pools whose mutations invalidate them.
+    pools = getattr(_tracking, "pools", None)
+    if pools is not None and pool not in pools:
+        pools.append(pool)
+    return pool
 
 
 def init():
-    global _warehouses
-    _warehouses = Warehouses(ROOT_PATH, DEBUG)
-    global _locations
-    _locations = Locations(ROOT_PATH, DEBUG)
-    global _transfers
-    _transfers = Transfers(ROOT_PATH, DEBUG)
-    global _items
-    _items = Items(ROOT_PATH, DEBUG)
-    global _item_lines
-    _item_lines = ItemLines(ROOT_PATH, DEBUG)
-    global _item_groups
-    _item_groups = ItemGroups(ROOT_PATH, DEBUG)
-    global _item_types
-    _item_types = ItemTypes(ROOT_PATH, DEBUG)
-    global _inventories
-    _inventories = Inventories(ROOT_PATH, DEBUG)
-    global _suppliers
-    _suppliers = Suppliers(ROOT_PATH, DEBUG)
-    global _orders
-    _orders = Orders(ROOT_PATH, DEBUG)
-    global _clients
-    _clients = Clients(ROOT_PATH, DEBUG)
-    global _shipments
-    _shipments = Shipments(ROOT_PATH, DEBUG)
+    global _pools
+    global _pool_locks
+    global _load_times
+    _pools = {}
+    _pool_locks = {}
+    _load_times = {}
+    for name in POOL_CLASSES:
+        _pool_locks[name] = threading.Lock()
+    if LOAD_MODE == "eager":
+        warm_up()
+    elif LOAD_MODE == "parallel":
+        warm_up_parallel()
+    elif LOAD_MODE == "background":
+        threading.Thread(target=warm_up, daemon=True).start()
+
+
+def load_pool(name):
+    pool = _pools.get(name)
+    if pool is not None:
+        return pool
+    # One lock per pool: a request needing a pool that is still loading waits
+    # for that pool only, not for the whole warm-up.
+    with _pool_locks[name]:
+        pool = _pools.get(name)
+        if pool is None:
+            start = time.perf_counter()
+            pool = POOL_CLASSES[name](ROOT_PATH, DEBUG, "mapped" if name in READ_ONLY_POOLS else STORAGE)
+            for listener in _listeners:
+                pool.add_listener(listener)
+            _load_times[name] = time.perf_counter() - start
+            _pools[name] = pool
+            print(f"Loaded {name} in {_load_times[name] * 1000:.1f} ms")
+    return pool
+
+
+def warm_up():
+    start = time.perf_counter()
+    for name in POOL_CLASSES:
+        try:
+            load_pool(name)
+        except Exception as e:
+            print(f"Loading {name} failed: {e}")
+    print(f"Loaded all pools in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def warm_up_parallel():
+    if not DEBUG and STORAGE == "json":
+        start = time.perf_counter()
+        paths = []
+        for name in POOL_CLASSES:
+            if name not in READ_ONLY_POOLS and not snapshot.is_fresh(ROOT_PATH + name + ".json"):
+                paths.append(ROOT_PATH + name + ".json")
+        try:
+            json_provider.parse_files(paths, LOAD_WORKERS)
+            print(f"Parsed all pools in {(time.perf_counter() - start) * 1000:.1f} ms")
+        except Exception as e:
+            # warm_up() below parses whatever is missing in this process.
+            print(f"Parallel parsing failed: {e}")
+    warm_up()
+
+
+def is_read_only(name):
+    return name in READ_ONLY_POOLS
+
+
+def get_load_status():
+    pools = {}
+    for name in POOL_CLASSES:
+        if name in _pools:
+            pools[name] = {"loaded": True, "load_time_ms": round(_load_times[name] * 1000, 1)}
+        else:
+            pools[name] = {"loaded": False}
+    return pools
 
 
 def fetch_warehouse_pool():
-    return _warehouses
+    return track(load_pool("warehouses"))
 
 
 def fetch_location_pool():
-    return _locations
+    return track(load_pool("locations"))
 
 
 def fetch_transfer_pool():
-    return _transfers
+    return track(load_pool("transfers"))
 
 
 def fetch_item_pool():
-    return _items
+    return track(load_pool("items"))
 
 
 def fetch_item_line_pool():
-    return _item_lines
+    return track(load_pool("item_lines"))
 
 
 def fetch_item_group_pool():
-    return _item_groups
+    return track(load_pool("item_groups"))
 
 
 def fetch_item_type_pool():
-    return _item_types
+    return track(load_pool("item_types"))
 
 
 def fetch_inventory_pool():
-    return _inventories
+    return track(load_pool("inventories"))
 
 
 def fetch_supplier_pool():
-    return _suppliers
+    return track(load_pool("suppliers"))
 
 
 def fetch_order_pool():
-    return _orders
+    return track(load_pool("orders"))
 
 
 def fetch_client_pool():
-    return _clients
+    return track(load_pool("clients"))
 
 
 def fetch_shipment_pool():
-    return _shipments
+    return track(load_pool("shipments"))
+
+
+def fetch_pools():
+    # Only the pools loaded so far; the others have nothing to save or compact.
+    return list(_pools.values())
+
+
+def fetch_pool(name):
+    if name not in POOL_CLASSES:
+        return None
+    return load_pool(name)
+
+
+def compact():
+    for pool in fetch_pools():
+        # Only the copy of the records is taken under the lock; the files
+        # are written without holding up the writers (and the readers
+        # queued behind them).
+        with read_lock():
+            copy = pool.start_compaction()
+        if copy is not None:
+            pool.finish_compaction(copy)
+
+
+def run_compaction():
+    stop = threading.Event()
+    while not stop.wait(JOURNAL_COMPACT_INTERVAL_SEC):
+        try:
+            compact()
+        except Exception as e:
+            print(f"Journal compaction failed: {e}")
+
+
+def start_compaction():
+    threading.Thread(target=run_compaction, daemon=True).start()
@@ -0,0 +1,49 @@
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson parses the data files several times faster than the json module and
+# is used whenever it is installed, unless JSON_DECODER=json.
+JSON_DECODER = os.environ.get("JSON_DECODER", "orjson" if orjson is not None else "json")
+
+_parsed = {}
+_lock = threading.Lock()
+
+
+def loads(data):
+    if JSON_DECODER == "orjson" and orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(path):
+    f = open(path, "rb")
+    data = f.read()
+    f.close()
+    return loads(data)
+
+
+def parse_files(paths, workers=None):
+    # Parses the files in worker processes, so the parsing isn't serialized by
+    # the GIL. The results are kept until read() asks for them.
+    paths = [x for x in paths if os.path.exists(x)]
+    if not paths:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for path, records in zip(paths, executor.map(load_file, paths)):
+            with _lock:
+                _parsed[path] = records
+
+
+def read(path):
+    with _lock:
+        records = _parsed.pop(path, None)
+    if records is not None:
+        return records
+    return load_file(path)
@@ -0,0 +1,161 @@
+import bisect
+import re
+import threading
+
+from providers import data_provider
+
+# Searchable fields per pool with their weight in the ranking.
+SEARCH_FIELDS = {
+    "clients": {"name": 3, "contact_name": 2, "contact_email": 2, "city": 1, "province": 1, "country": 1, "zip_code": 1},
+    "suppliers": {"name": 3, "code": 3, "contact_name": 2, "reference": 2, "city": 1, "province": 1, "country": 1},
+    "items": {"uid": 3, "code": 3, "description": 2, "short_description": 2, "upc_code": 2, "model_number": 2,
+              "supplier_code": 1, "supplier_part_number": 1},
+}
+
+SEARCH_DEFAULT_LIMIT = 20
+
+# A whole-token match outranks a match on a longer token that merely
+# starts with the query term.
+PREFIX_FACTOR = 0.5
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+class SearchIndex:
+    # Inverted index for one pool: postings map a token to the keys (and
+    # their weight) of the records containing it, and the tokens are also
+    # kept sorted so a prefix is a bisect range instead of a scan.
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.postings = {}
+        self.tokens = []
+        self.documents = {}
+
+    def add(self, key, record):
+        self.remove(key)
+        weights = {}
+        for field, weight in self.fields.items():
+            value = record.get(field)
+            if value is None:
+                continue
+            for token in tokenize(str(value)):
+                weights[token] = weights.get(token, 0) + weight
+        for token, weight in weights.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = {}
+                self.postings[token] = posting
+                bisect.insort(self.tokens, token)
+            posting[key] = weight
+        self.documents[key] = list(weights)
+
+    def remove(self, key):
+        for token in self.documents.pop(key, []):
+            posting = self.postings[token]
+            del posting[key]
+            if not posting:
+                del self.postings[token]
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+
+    def match(self, term):
+        scores = {}
+        start = bisect.bisect_left(self.tokens, term)
+        for i in range(start, len(self.tokens)):
+            token = self.tokens[i]
+            if not token.startswith(term):
+                break
+            factor = 1 if token == term else PREFIX_FACTOR
+            for key, weight in self.postings[token].items():
+                score = weight * factor
+                if score > scores.get(key, 0):
+                    scores[key] = score
+        return scores
+
+    def search(self, terms):
+        # Every term has to match (as a token or a token prefix); the score
+        # adds up the best match of each term.
+        result = None
+        for term in terms:
+            scores = self.match(term)
+            if result is None:
+                result = scores
+                continue
+            combined = {}
+            for key, score in result.items():
+                if key in scores:
+                    combined[key] = score + scores[key]
+            result = combined
+            if not result:
+                break
+        return result or {}
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def init():
+    data_provider.add_listener(update)
+
+
+def start():
+    # Builds the indexes in the background unless pools are meant to load
+    # only on demand; a search before that just builds its index itself.
+    if data_provider.LOAD_MODE != "lazy":
+        threading.Thread(target=warm_up, daemon=True).start()
+
+
+def warm_up():
+    for name in SEARCH_FIELDS:
+        try:
+            # Requests build their index under the read lock already.
+            with data_provider.read_lock():
+                get_index(name)
+        except Exception as e:
+            print(f"Building the search index for {name} failed: {e}")
+
+
+def get_index(name):
+    # Built on the first search of a pool and kept current by update().
+    with _lock:
+        index = _indexes.get(name)
+        if index is None:
+            index = SearchIndex(SEARCH_FIELDS[name])
+            for key, record in data_provider.fetch_pool(name).data.items():
+                index.add(key, record)
+            _indexes[name] = index
+        return index
+
+
+def update(pool, op, key, record):
+    with _lock:
+        index = _indexes.get(pool.get_name())
+        if index is None:
+            return
+        if op == "put":
+            index.add(key, record)
+        else:
+            index.remove(key)
+
+
+def search(query, names, limit=SEARCH_DEFAULT_LIMIT, offset=0):
+    terms = tokenize(query)
+    matches = []
+    if terms:
+        for name in names:
+            index = get_index(name)
+            with _lock:
+                scores = index.search(terms)
+            for key, score in scores.items():
+                matches.append((-score, name, key))
+    matches.sort()
+    results = []
+    for score, name, key in matches[offset:offset + limit]:
+        record = data_provider.fetch_pool(name).get_record(key)
+        if record is not None:
+            results.append({"type": name, "score": -score, "record": record})
+    return results, len(matches)
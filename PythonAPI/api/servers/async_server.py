@@ -0,0 +1,186 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from processors import event_processor
+
+KEEP_ALIVE_TIMEOUT_SEC = 75
+MAX_HEADER_BYTES = 65536
+
+NOT_FOUND = b"HTTP/1.1 404 Not Found\r\n\r\n"
+
+
+class ResponseWriter:
+    # Buffers a normal response so it can be reframed for keep-alive, but
+    # forwards streamed responses (chunked, or delimited by the connection
+    # closing as for HTTP/1.0 clients) to the socket as they are written,
+    # blocking the worker thread until the transport has drained.
+
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+        self.buffer = io.BytesIO()
+        self.streaming = False
+        # An /events subscriber handed over by the handler, written from the
+        # loop once the handler has returned.
+        self.events = None
+
+    def write(self, data):
+        if not self.streaming and self.buffer.tell() == 0:
+            head = bytes(data).split(b"\r\n\r\n", 1)[0].lower() + b"\r\n"
+            self.streaming = b"\r\ntransfer-encoding: chunked\r\n" in head or b"\r\nconnection: close\r\n" in head
+        if self.streaming:
+            asyncio.run_coroutine_threadsafe(self.send(data), self.loop).result()
+        else:
+            self.buffer.write(data)
+        return len(data)
+
+    async def send(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return self.buffer.getvalue()
+
+
+def run_handler(handler_class, raw_request, client_address, wfile):
+    # Drive the regular request handler against an in-memory request so the
+    # handle_*_version_1 logic is shared with the socketserver front ends.
+    handler = handler_class.__new__(handler_class)
+    handler.client_address = client_address
+    handler.server = None
+    handler.rfile = io.BytesIO(raw_request)
+    handler.wfile = wfile
+    handler.close_connection = True
+    handler.handle_one_request()
+
+
+def parse_head(head):
+    lines = head.split(b"\r\n")
+    version = lines[0].rsplit(b" ", 1)[-1].upper()
+    content_length = 0
+    connection = b""
+    for line in lines[1:]:
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            content_length = int(value.strip())
+        elif name == b"connection":
+            connection = value.strip().lower()
+    if version == b"HTTP/1.1":
+        keep_alive = connection != b"close"
+    else:
+        keep_alive = connection == b"keep-alive"
+    return content_length, keep_alive
+
+
+def frame_response(raw_response, keep_alive):
+    # The handlers write HTTP/1.0 style responses that end at connection
+    # close; add the framing headers needed to reuse the connection.
+    if not raw_response:
+        raw_response = NOT_FOUND
+    head, _, body = raw_response.partition(b"\r\n\r\n")
+    lines = head.split(b"\r\n")
+    status = b"HTTP/1.1 " + lines[0].split(b" ", 1)[1]
+    result = [status]
+    for line in lines[1:]:
+        name = line.partition(b":")[0].strip().lower()
+        if name not in (b"content-length", b"connection"):
+            result.append(line)
+    result.append(b"Content-Length: " + str(len(body)).encode())
+    result.append(b"Connection: keep-alive" if keep_alive else b"Connection: close")
+    return b"\r\n".join(result) + b"\r\n\r\n" + body
+
+
+class AsyncServer:
+    def __init__(self, server_address, handler_class, workers=8):
+        self.server_address = server_address
+        self.handler_class = handler_class
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    async def handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        client_address = writer.get_extra_info("peername")
+        try:
+            while True:
+                # Pipelined requests stay buffered in the reader and are
+                # answered in order, one per loop iteration.
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT_SEC)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                    break
+                head = head.lstrip(b"\r\n")
+                if not head:
+                    continue
+                try:
+                    content_length, keep_alive = parse_head(head[:-4])
+                except ValueError:
+                    writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                    break
+                body = b""
+                if content_length:
+                    body = await reader.readexactly(content_length)
+                wfile = ResponseWriter(loop, writer)
+                await loop.run_in_executor(self.executor, run_handler, self.handler_class, head + body, client_address, wfile)
+                if wfile.events is not None:
+                    await self.stream_events(reader, writer, wfile.events)
+                    break
+                if wfile.streaming:
+                    # Streamed responses announce Connection: close.
+                    break
+                writer.write(frame_response(wfile.getvalue(), keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def stream_events(self, reader, writer, subscriber):
+        # Runs on the loop, so an open stream holds no executor thread. The
+        # publisher wakes it through the subscriber; the transport buffers
+        # what a slow client hasn't read yet, up to EVENT_MAX_PENDING_BYTES.
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        subscriber.wakeup = lambda: loop.call_soon_threadsafe(ready.set)
+        # Clients send nothing after the request; this ends when they hang up.
+        hung_up = asyncio.ensure_future(reader.read())
+        data = event_processor.RETRY
+        try:
+            while not subscriber.closed and not hung_up.done():
+                ready.clear()
+                data += subscriber.read()
+                if data:
+                    writer.write(data)
+                    data = b""
+                if writer.transport.get_write_buffer_size() > event_processor.EVENT_MAX_PENDING_BYTES:
+                    break
+                waiting = asyncio.ensure_future(ready.wait())
+                done, _ = await asyncio.wait([waiting, hung_up], timeout=event_processor.EVENT_HEARTBEAT_SEC,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                waiting.cancel()
+                if not done:
+                    data = event_processor.KEEP_ALIVE
+        finally:
+            hung_up.cancel()
+            subscriber.closed = True
+            event_processor.unsubscribe(subscriber)
+
+    async def serve(self):
+        host, port = self.server_address
+        server = await asyncio.start_server(self.handle_connection, host or None, port, limit=MAX_HEADER_BYTES)
+        async with server:
+            await server.serve_forever()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.executor.shutdown(wait=False)
+
+    def serve_forever(self):
+        asyncio.run(self.serve())
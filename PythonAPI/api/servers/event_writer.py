@@ -0,0 +1,122 @@
+import selectors
+import socket
+import threading
+import time
+
+from processors import event_processor
+
+# Writes the /events streams of the socketserver front ends from a single
+# thread. The handler sends the headers and hands its socket over here, so
+# an open stream holds a file descriptor instead of a request worker. The
+# sockets are non-blocking: a selector says when a client can take more of
+# its pending output, or has hung up.
+
+
+class Stream:
+    def __init__(self, sock, subscriber):
+        self.socket = sock
+        self.subscriber = subscriber
+        self.pending = bytearray(event_processor.RETRY)
+        self.last_write = time.monotonic()
+
+
+_selector = None
+_waker = None
+_wakee = None
+_added = []
+_streams = []
+_lock = threading.Lock()
+
+
+def add(sock, subscriber):
+    start()
+    sock.setblocking(False)
+    subscriber.wakeup = wake
+    with _lock:
+        _added.append(Stream(sock, subscriber))
+    wake()
+
+
+def wake():
+    try:
+        _waker.send(b"\0")
+    except (BlockingIOError, OSError):
+        # A full pipe already means a wakeup is pending.
+        pass
+
+
+def start():
+    global _selector, _waker, _wakee
+    with _lock:
+        if _selector is not None:
+            return
+        _selector = selectors.DefaultSelector()
+        _waker, _wakee = socket.socketpair()
+        _waker.setblocking(False)
+        _wakee.setblocking(False)
+        _selector.register(_wakee, selectors.EVENT_READ)
+        threading.Thread(target=run, name="event-writer", daemon=True).start()
+
+
+def run():
+    while True:
+        timeout = event_processor.EVENT_HEARTBEAT_SEC
+        now = time.monotonic()
+        for stream in _streams:
+            timeout = min(timeout, max(stream.last_write + event_processor.EVENT_HEARTBEAT_SEC - now, 0))
+        for key, mask in _selector.select(timeout):
+            if key.fileobj is _wakee:
+                try:
+                    while _wakee.recv(4096):
+                        pass
+                except BlockingIOError:
+                    pass
+            elif mask & selectors.EVENT_READ:
+                # Clients send nothing after the request, so a readable
+                # socket means it was closed (or is misbehaving).
+                close(key.data)
+        with _lock:
+            added = _added[:]
+            del _added[:]
+        for stream in added:
+            _selector.register(stream.socket, selectors.EVENT_READ, stream)
+            _streams.append(stream)
+        now = time.monotonic()
+        for stream in _streams[:]:
+            if stream.subscriber.closed:
+                close(stream)
+                continue
+            stream.pending += stream.subscriber.read()
+            if not stream.pending and now - stream.last_write >= event_processor.EVENT_HEARTBEAT_SEC:
+                stream.pending += event_processor.KEEP_ALIVE
+            flush(stream, now)
+
+
+def flush(stream, now):
+    if stream.pending:
+        try:
+            sent = stream.socket.send(stream.pending)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            close(stream)
+            return
+        if sent:
+            del stream.pending[:sent]
+            stream.last_write = now
+    if len(stream.pending) > event_processor.EVENT_MAX_PENDING_BYTES:
+        close(stream)
+        return
+    events = selectors.EVENT_READ
+    if stream.pending:
+        events |= selectors.EVENT_WRITE
+    _selector.modify(stream.socket, events, stream)
+
+
+def close(stream):
+    if stream in _streams:
+        _streams.remove(stream)
+        _selector.unregister(stream.socket)
+    stream.socket.close()
+    stream.subscriber.closed = True
+    event_processor.unsubscribe(stream.subscriber)
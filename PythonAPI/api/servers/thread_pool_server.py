@@ -0,0 +1,38 @@
+import queue
+import socketserver
+import threading
+
+SERVICE_UNAVAILABLE = b"HTTP/1.0 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+class ThreadPoolServer(socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class, workers=8, queue_size=64):
+        self.request_queue_size = queue_size
+        self.pending = queue.Queue(queue_size)
+        socketserver.TCPServer.__init__(self, server_address, handler_class)
+        for i in range(workers):
+            threading.Thread(target=self.process_requests, name=f"worker-{i}", daemon=True).start()
+
+    def process_request(self, request, client_address):
+        try:
+            self.pending.put_nowait((request, client_address))
+        except queue.Full:
+            # Shed load instead of letting accepted sockets pile up unbounded.
+            try:
+                request.sendall(SERVICE_UNAVAILABLE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+
+    def process_requests(self):
+        while True:
+            request, client_address = self.pending.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
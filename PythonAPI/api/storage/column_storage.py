@@ -0,0 +1,258 @@
+import bisect
+import sys
+from array import array
+
+# Marks a field the record doesn't have; ABSENT in integer columns.
+MISSING = object()
+ABSENT = -2 ** 63
+
+
+class ColumnStorage:
+    # Keeps records as rows across per-field columns instead of one dict per
+    # record: integer fields go into typed arrays, other known fields into
+    # lists, and anything else (unknown fields, non-integer numbers) into a
+    # small per-row dict. get() builds a fresh dict from the row, so callers
+    # can modify it and hand it back through put() like before.
+
+    def __init__(self, indexes, fields, int_fields, totals=None):
+        self.indexes = indexes
+        self.fields = fields
+        self.int_fields = int_fields
+        # Optional (group field, summed fields): running sums per group value,
+        # kept up to date by put() and remove() so sum_fields() on them is a
+        # lookup instead of a pass over the group's rows.
+        self.total_group = None
+        self.total_fields = []
+        if totals is not None:
+            self.total_group, self.total_fields = totals
+        self.totals = {}
+        self.columns = {}
+        for field in fields:
+            self.columns[field] = array("q") if field in int_fields else []
+        self.rows = {}
+        self.free = []
+        self.extras = {}
+        self.lookups = {}
+        self.sorted_keys = None
+        for field in indexes:
+            self.lookups[field] = {}
+
+    def get(self, key, default=None):
+        row = self.rows.get(key)
+        if row is None:
+            return default
+        return self.read_row(row)
+
+    def __getitem__(self, key):
+        return self.read_row(self.rows[key])
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(list(self.rows))
+
+    def items(self):
+        for key, row in list(self.rows.items()):
+            yield key, self.read_row(row)
+
+    def values(self):
+        for row in list(self.rows.values()):
+            yield self.read_row(row)
+
+    def read_row(self, row):
+        record = {}
+        for field in self.fields:
+            value = self.columns[field][row]
+            if value is MISSING or value == ABSENT and field in self.int_fields:
+                continue
+            if isinstance(value, tuple):
+                value = list(value)
+            record[field] = value
+        extra = self.extras.get(row)
+        if extra is not None:
+            for field, value in extra.items():
+                if isinstance(value, tuple):
+                    value = list(value)
+                record[field] = value
+        return record
+
+    def write_row(self, row, record):
+        extra = None
+        for field in self.fields:
+            value = record.get(field, MISSING)
+            if field in self.int_fields:
+                if value is MISSING:
+                    value = ABSENT
+                elif type(value) is not int or value == ABSENT or not -2 ** 63 <= value < 2 ** 63:
+                    extra = extra or {}
+                    extra[field] = value
+                    value = ABSENT
+            elif isinstance(value, list):
+                value = tuple(value)
+            elif isinstance(value, str):
+                # item ids and the like repeat across rows.
+                value = sys.intern(value)
+            column = self.columns[field]
+            if row == len(column):
+                column.append(value)
+            else:
+                column[row] = value
+        for field, value in record.items():
+            if field not in self.columns:
+                extra = extra or {}
+                extra[field] = tuple(value) if isinstance(value, list) else value
+        if extra is None:
+            self.extras.pop(row, None)
+        else:
+            self.extras[row] = extra
+
+    def put(self, key, record):
+        row = self.rows.get(key)
+        if row is not None:
+            self.unindex_record(key, row)
+            self.uncount_row(row)
+        else:
+            if self.free:
+                row = self.free.pop()
+            else:
+                row = len(self.columns[self.fields[0]])
+            self.rows[key] = row
+            if self.sorted_keys is not None:
+                bisect.insort(self.sorted_keys, key)
+        self.write_row(row, record)
+        self.index_record(key, row)
+        self.count_row(row)
+
+    def remove(self, key):
+        row = self.rows.pop(key)
+        self.unindex_record(key, row)
+        self.uncount_row(row)
+        for field in self.fields:
+            self.columns[field][row] = ABSENT if field in self.int_fields else MISSING
+        self.extras.pop(row, None)
+        self.free.append(row)
+        if self.sorted_keys is not None:
+            del self.sorted_keys[bisect.bisect_left(self.sorted_keys, key)]
+
+    def field_value(self, row, field):
+        extra = self.extras.get(row)
+        if extra is not None and field in extra:
+            return extra[field]
+        if field not in self.columns:
+            return None
+        value = self.columns[field][row]
+        if value is MISSING or value == ABSENT and field in self.int_fields:
+            return None
+        return value
+
+    def index_record(self, key, row):
+        for field in self.indexes:
+            for v in self.index_values(self.field_value(row, field)):
+                self.lookups[field].setdefault(v, {})[key] = None
+
+    def unindex_record(self, key, row):
+        for field in self.indexes:
+            for v in self.index_values(self.field_value(row, field)):
+                bucket = self.lookups[field].get(v)
+                if bucket is not None:
+                    bucket.pop(key, None)
+                    if not bucket:
+                        del self.lookups[field][v]
+
+    def index_values(self, value):
+        if isinstance(value, (list, tuple)):
+            return value
+        return [value]
+
+    def find(self, field, value):
+        records = []
+        for key in self.lookups[field].get(value, {}):
+            records.append(self.read_row(self.rows[key]))
+        return records
+
+    def row_totals(self, row):
+        values = []
+        for name in self.total_fields:
+            value = self.field_value(row, name)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                value = 0
+            values.append(value)
+        return values
+
+    def count_row(self, row):
+        if self.total_group is None:
+            return
+        group = self.field_value(row, self.total_group)
+        totals = self.totals.get(group)
+        if totals is None:
+            totals = [0] * (len(self.total_fields) + 1)
+            self.totals[group] = totals
+        for i, value in enumerate(self.row_totals(row)):
+            totals[i] += value
+        totals[-1] += 1
+
+    def uncount_row(self, row):
+        # Runs before the row is overwritten or cleared, so the columns
+        # still hold exactly what count_row() added.
+        if self.total_group is None:
+            return
+        group = self.field_value(row, self.total_group)
+        totals = self.totals[group]
+        for i, value in enumerate(self.row_totals(row)):
+            totals[i] -= value
+        totals[-1] -= 1
+        if totals[-1] == 0:
+            del self.totals[group]
+
+    def sum_fields(self, field, value, fields):
+        if field == self.total_group:
+            totals = self.totals.get(value)
+            result = []
+            for name in fields:
+                if name not in self.total_fields:
+                    break
+                result.append(totals[self.total_fields.index(name)] if totals is not None else 0)
+            else:
+                return result
+        # Sums integer columns over the rows in an index bucket without
+        # building the records.
+        rows = []
+        for key in self.lookups[field].get(value, {}):
+            rows.append(self.rows[key])
+        totals = []
+        for name in fields:
+            total = sum(v for v in map(self.columns[name].__getitem__, rows) if v != ABSENT)
+            for row in rows:
+                extra = self.extras.get(row)
+                if extra is not None and isinstance(extra.get(name), (int, float)):
+                    total += extra[name]
+            totals.append(total)
+        return totals
+
+    def get_many(self, keys):
+        records = []
+        for key in keys:
+            row = self.rows.get(key)
+            if row is not None:
+                records.append(self.read_row(row))
+        return records
+
+    def page_keys(self, limit, offset, cursor):
+        if self.sorted_keys is None:
+            self.sorted_keys = sorted(self.rows)
+        keys = self.sorted_keys
+        start = offset
+        if cursor is not None:
+            start += bisect.bisect_right(keys, cursor)
+        end = len(keys) if limit is None else min(start + limit, len(keys))
+        next_cursor = None
+        if end < len(keys) and end > start:
+            next_cursor = keys[end - 1]
+        return keys[start:end], len(keys), next_cursor
+
+    def commit(self):
+        pass
@@ -0,0 +1,157 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+from array import array
+
+from providers import json_provider
+
+# Read-only record file for int keyed pools, laid out as:
+#   header          magic, version, record count, last_modified (utf-8, padded)
+#   keys            count int64 ids in ascending order
+#   offsets         count + 1 uint64 offsets into the data section
+#   data            the JSON encoded records, in key order
+# The file is memory-mapped, so processes serving the same pool share one
+# copy in the page cache and a record is only decoded when it is asked for.
+MAGIC = b"CHRECS"
+VERSION = 1
+HEADER = struct.Struct("<6sHQ40s")
+
+
+def get_path(data_path):
+    return os.path.splitext(data_path)[0] + ".records"
+
+
+def is_fresh(path, sources):
+    if not os.path.exists(path):
+        return False
+    mtime = os.path.getmtime(path)
+    for source in sources:
+        if os.path.exists(source) and os.path.getmtime(source) > mtime:
+            return False
+    return True
+
+
+def write(path, records, key, last_modified):
+    records = sorted(records, key=lambda x: x[key])
+    keys = array("q")
+    offsets = array("Q", [0])
+    chunks = []
+    size = 0
+    for record in records:
+        chunk = json.dumps(record).encode("utf-8")
+        keys.append(record[key])
+        size += len(chunk)
+        offsets.append(size)
+        chunks.append(chunk)
+    modified = last_modified.isoformat().encode("utf-8") if last_modified is not None else b""
+    # Unique per process, so workers rebuilding the same file don't collide.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    f = open(tmp_path, "wb")
+    f.write(HEADER.pack(MAGIC, VERSION, len(records), modified))
+    f.write(keys.tobytes())
+    f.write(offsets.tobytes())
+    for chunk in chunks:
+        f.write(chunk)
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+    os.replace(tmp_path, path)
+
+
+class MappedStorage:
+    # Implements the read side of the storage methods the models use on
+    # self.data; writes raise PermissionError.
+
+    def __init__(self, path):
+        f = open(path, "rb")
+        self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+        magic, version, count, modified = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a records file")
+        self.last_modified = modified.rstrip(b"\0").decode("utf-8") or None
+        view = memoryview(self.map)
+        keys_start = HEADER.size
+        offsets_start = keys_start + count * 8
+        self.data_start = offsets_start + (count + 1) * 8
+        self.keys = view[keys_start:offsets_start].cast("q")
+        self.offsets = view[offsets_start:self.data_start].cast("Q")
+
+    def position(self, key):
+        if not isinstance(key, int):
+            return None
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return i
+        return None
+
+    def record_at(self, i):
+        start = self.data_start + self.offsets[i]
+        end = self.data_start + self.offsets[i + 1]
+        return json_provider.loads(self.map[start:end])
+
+    def get(self, key, default=None):
+        i = self.position(key)
+        if i is None:
+            return default
+        return self.record_at(i)
+
+    def __getitem__(self, key):
+        i = self.position(key)
+        if i is None:
+            raise KeyError(key)
+        return self.record_at(i)
+
+    def __contains__(self, key):
+        return self.position(key) is not None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys.tolist())
+
+    def items(self):
+        for i in range(len(self.keys)):
+            yield self.keys[i], self.record_at(i)
+
+    def values(self):
+        for i in range(len(self.keys)):
+            yield self.record_at(i)
+
+    def find(self, field, value):
+        records = []
+        for record in self.values():
+            if record.get(field) == value:
+                records.append(record)
+        return records
+
+    def get_many(self, keys):
+        records = []
+        for key in keys:
+            record = self.get(key)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def page_keys(self, limit, offset, cursor):
+        total = len(self.keys)
+        start = offset
+        if cursor is not None:
+            start += bisect.bisect_right(self.keys, cursor)
+        end = total if limit is None else min(start + limit, total)
+        next_cursor = None
+        if end < total and end > start:
+            next_cursor = self.keys[end - 1]
+        return self.keys[start:end].tolist(), total, next_cursor
+
+    def put(self, key, record):
+        raise PermissionError("read-only pool")
+
+    def remove(self, key):
+        raise PermissionError("read-only pool")
+
+    def commit(self):
+        pass
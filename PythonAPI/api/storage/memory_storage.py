@@ -0,0 +1,86 @@
+import bisect
+
+
+class MemoryStorage(dict):
+    # Records keyed by id in insertion order, plus the secondary indexes
+    # declared by the pool and a lazily built sorted id list for paging.
+
+    def __init__(self, indexes):
+        super().__init__()
+        self.indexes = indexes
+        self.lookups = {}
+        self.indexed = {}
+        self.sorted_keys = None
+        for field in indexes:
+            self.lookups[field] = {}
+
+    def put(self, key, record):
+        if key in self:
+            self.unindex_record(key)
+        elif self.sorted_keys is not None:
+            bisect.insort(self.sorted_keys, key)
+        self[key] = record
+        self.index_record(key, record)
+
+    def remove(self, key):
+        self.unindex_record(key)
+        del self[key]
+        if self.sorted_keys is not None:
+            del self.sorted_keys[bisect.bisect_left(self.sorted_keys, key)]
+
+    def find(self, field, value):
+        return list(self.lookups[field].get(value, {}).values())
+
+    def get_many(self, keys):
+        records = []
+        for key in keys:
+            record = self.get(key)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def page_keys(self, limit, offset, cursor):
+        if self.sorted_keys is None:
+            self.sorted_keys = sorted(self)
+        keys = self.sorted_keys
+        start = offset
+        if cursor is not None:
+            start += bisect.bisect_right(keys, cursor)
+        end = len(keys) if limit is None else min(start + limit, len(keys))
+        next_cursor = None
+        if end < len(keys) and end > start:
+            next_cursor = keys[end - 1]
+        return keys[start:end], len(keys), next_cursor
+
+    def index_record(self, key, record):
+        if not self.indexes:
+            return
+        values = {}
+        for field in self.indexes:
+            value = record.get(field)
+            values[field] = value
+            for v in self.index_values(value):
+                self.lookups[field].setdefault(v, {})[key] = record
+        # Callers often mutate a fetched record before updating it, so the
+        # indexed values are remembered to unindex the old entries reliably.
+        self.indexed[key] = values
+
+    def unindex_record(self, key):
+        values = self.indexed.pop(key, None)
+        if values is None:
+            return
+        for field, value in values.items():
+            for v in self.index_values(value):
+                bucket = self.lookups[field].get(v)
+                if bucket is not None:
+                    bucket.pop(key, None)
+                    if not bucket:
+                        del self.lookups[field][v]
+
+    def index_values(self, value):
+        if isinstance(value, list):
+            return value
+        return [value]
+
+    def commit(self):
+        pass
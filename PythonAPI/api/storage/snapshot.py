@@ -0,0 +1,74 @@
+import gc
+import os
+import pickle
+import struct
+import zlib
+
+# Binary copy of a pool's JSON file: a fixed header (magic, schema version,
+# crc32 and length of the payload) followed by the records pickled with
+# protocol 5. Bump SCHEMA_VERSION when the layout of the payload changes;
+# snapshots with another version are ignored and rewritten from the JSON.
+MAGIC = b"CHSNAP"
+SCHEMA_VERSION = 1
+HEADER = struct.Struct("<6sHIQ")
+
+ENABLED = os.environ.get("SNAPSHOTS", "1") != "0"
+
+
+def get_path(data_path):
+    return os.path.splitext(data_path)[0] + ".snapshot"
+
+
+def is_fresh(data_path):
+    # The snapshot is only used when it was written after the JSON file, so
+    # a JSON file edited by hand (or a compaction cut short between the two
+    # writes) always wins.
+    path = get_path(data_path)
+    if not ENABLED or not os.path.exists(path):
+        return False
+    if not os.path.exists(data_path):
+        return True
+    return os.path.getmtime(path) >= os.path.getmtime(data_path)
+
+
+def read(data_path):
+    if not is_fresh(data_path):
+        return None
+    f = open(get_path(data_path), "rb")
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        f.close()
+        return None
+    magic, version, checksum, length = HEADER.unpack(header)
+    if magic != MAGIC or version != SCHEMA_VERSION:
+        f.close()
+        return None
+    payload = f.read(length)
+    f.close()
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        print(f"Ignoring damaged snapshot {get_path(data_path)}")
+        return None
+    # Unpickling allocates every record at once; the cyclic collector would
+    # run many times over objects that can't form cycles.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(payload)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def write(data_path, records):
+    if not ENABLED:
+        return
+    payload = pickle.dumps(records, protocol=5)
+    path = get_path(data_path)
+    tmp_path = path + ".tmp"
+    f = open(tmp_path, "wb")
+    f.write(HEADER.pack(MAGIC, SCHEMA_VERSION, zlib.crc32(payload), len(payload)))
+    f.write(payload)
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+    os.replace(tmp_path, path)
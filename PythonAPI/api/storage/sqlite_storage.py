@@ -0,0 +1,150 @@
+import json
+import sqlite3
+import threading
+
+BATCH_SIZE = 500
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def connect(path):
+    # Pools share one connection per database file: SQLite allows a single
+    # writer per file, and a request may write to several pools before save().
+    with _connections_lock:
+        if path not in _connections:
+            connection = sqlite3.connect(path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            _connections[path] = (connection, threading.RLock())
+        return _connections[path]
+
+
+class SQLiteStorage:
+    # Stores each record as a JSON document in an "id" keyed table, with an
+    # expression index per declared secondary index field. Implements the
+    # mapping methods the models use on self.data.
+
+    def __init__(self, path, table, key_type, indexes):
+        self.connection, self.lock = connect(path)
+        self.table = table
+        self.indexes = indexes
+        column_type = "INTEGER" if key_type is int else "TEXT"
+        with self.lock:
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS {table} (id {column_type} PRIMARY KEY, record TEXT NOT NULL)")
+            for field in indexes:
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_{field} ON {table} (json_extract(record, '$.{field}'))")
+            self.connection.commit()
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def get(self, key, default=None):
+        rows = self.query(f"SELECT record FROM {self.table} WHERE id = ?", (key,))
+        if not rows:
+            return default
+        return json.loads(rows[0][0])
+
+    def __getitem__(self, key):
+        record = self.get(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __contains__(self, key):
+        return bool(self.query(f"SELECT 1 FROM {self.table} WHERE id = ?", (key,)))
+
+    def __len__(self):
+        return self.query(f"SELECT COUNT(*) FROM {self.table}")[0][0]
+
+    def __iter__(self):
+        for key, record in self.items():
+            yield key
+
+    def items(self):
+        # Rows are fetched in batches so iterating a large table never holds
+        # more than BATCH_SIZE decoded records at a time.
+        last = None
+        while True:
+            if last is None:
+                rows = self.query(f"SELECT id, record FROM {self.table} ORDER BY id LIMIT ?", (BATCH_SIZE,))
+            else:
+                rows = self.query(f"SELECT id, record FROM {self.table} WHERE id > ? ORDER BY id LIMIT ?", (last, BATCH_SIZE))
+            for key, record in rows:
+                yield key, json.loads(record)
+            if len(rows) < BATCH_SIZE:
+                return
+            last = rows[-1][0]
+
+    def values(self):
+        for key, record in self.items():
+            yield record
+
+    def is_empty(self):
+        return not self.query(f"SELECT 1 FROM {self.table} LIMIT 1")
+
+    def put(self, key, record):
+        with self.lock:
+            self.connection.execute(
+                f"INSERT INTO {self.table} (id, record) VALUES (?, ?) ON CONFLICT (id) DO UPDATE SET record = excluded.record",
+                (key, json.dumps(record)))
+
+    def remove(self, key):
+        with self.lock:
+            self.connection.execute(f"DELETE FROM {self.table} WHERE id = ?", (key,))
+
+    def find(self, field, value):
+        rows = self.query(f"SELECT record FROM {self.table} WHERE json_extract(record, '$.{field}') IS ? ORDER BY id", (value,))
+        records = []
+        for row in rows:
+            records.append(json.loads(row[0]))
+        return records
+
+    def sum_fields(self, field, value, fields):
+        sums = []
+        for name in fields:
+            sums.append(f"TOTAL(json_extract(record, '$.{name}'))")
+        row = self.query(f"SELECT {', '.join(sums)} FROM {self.table} WHERE json_extract(record, '$.{field}') IS ?", (value,))[0]
+        totals = []
+        for total in row:
+            totals.append(int(total) if total == int(total) else total)
+        return totals
+
+    def get_many(self, keys):
+        found = {}
+        for i in range(0, len(keys), BATCH_SIZE):
+            batch = keys[i:i + BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            for key, record in self.query(f"SELECT id, record FROM {self.table} WHERE id IN ({placeholders})", batch):
+                found[key] = json.loads(record)
+        records = []
+        for key in keys:
+            if key in found:
+                records.append(found[key])
+        return records
+
+    def page_keys(self, limit, offset, cursor):
+        total = len(self)
+        where = ""
+        params = []
+        if cursor is not None:
+            where = "WHERE id > ?"
+            params.append(cursor)
+        params += [-1 if limit is None else limit, offset]
+        rows = self.query(f"SELECT id FROM {self.table} {where} ORDER BY id LIMIT ? OFFSET ?", params)
+        keys = []
+        for row in rows:
+            keys.append(row[0])
+        next_cursor = None
+        if keys and self.query(f"SELECT 1 FROM {self.table} WHERE id > ? LIMIT 1", (keys[-1],)):
+            next_cursor = keys[-1]
+        return keys, total, next_cursor
+
+    def commit(self):
+        with self.lock:
+            self.connection.commit()
+
+    def checkpoint(self):
+        with self.lock:
+            self.connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
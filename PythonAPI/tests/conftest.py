@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The API modules import each other from the api folder, like the server
+# does when started from the PythonAPI folder.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api"))
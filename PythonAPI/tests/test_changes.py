@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from models.clients import Clients
+from providers import changes_provider
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.setattr("storage.snapshot.ENABLED", False)
+    clients = []
+    for i in range(1, 11):
+        clients.append({"id": i, "name": f"client {i}"})
+    (tmp_path / "clients.json").write_text(json.dumps(clients))
+    pool = Clients(str(tmp_path) + "/")
+    pool.add_listener(changes_provider.log_change)
+    return pool
+
+
+def sync(pool, since, limit, records=None):
+    # Follows the tokens until the feed has nothing more, like a client.
+    if records is None:
+        records = {}
+    pages = 0
+    more = True
+    while more:
+        changes, since, more = changes_provider.get_changes(pool, since, limit)
+        pages += 1
+        assert len(changes) <= limit
+        for change in changes:
+            if change["op"] == "put":
+                records[change["id"]] = change["record"]
+            else:
+                records.pop(change["id"], None)
+    return records, since, pages
+
+
+def test_first_sync_is_paged(pool):
+    records, token, pages = sync(pool, None, 3)
+    assert pages == 4
+    assert records == dict(pool.data.items())
+    changes, _, more = changes_provider.get_changes(pool, token, 3)
+    assert changes == [] and not more
+
+
+def test_writes_during_the_first_sync_come_through_afterwards(pool):
+    changes, token, more = changes_provider.get_changes(pool, None, 4)
+    assert more
+    records = {}
+    for change in changes:
+        records[change["id"]] = change["record"]
+    # One change behind the cursor, one ahead of it, a removal and an add.
+    pool.update_client(2, {"id": 2, "name": "renamed"})
+    pool.update_client(9, {"id": 9, "name": "renamed too"})
+    pool.remove_client(6)
+    pool.add_client({"id": 11, "name": "client 11"})
+    records, token, pages = sync(pool, token, 4, records)
+    assert records[2]["name"] == "client 2"
+    # The next call replays what changed since the sync started.
+    records, token, pages = sync(pool, token, 4, records)
+    assert records == dict(pool.data.items())
+    changes, _, more = changes_provider.get_changes(pool, token, 4)
+    assert changes == [] and not more
+
+
+def test_bad_cursor_is_rejected(pool):
+    _, token, _ = changes_provider.get_changes(pool, None, 3)
+    with pytest.raises(ValueError):
+        changes_provider.get_changes(pool, token.rsplit(".", 1)[0] + ".abc", 3)
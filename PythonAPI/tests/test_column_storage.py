@@ -0,0 +1,132 @@
+import json
+import random
+
+import pytest
+
+from models.inventories import FIELDS, INT_FIELDS, TOTAL_FIELDS, Inventories
+from storage.column_storage import ABSENT, ColumnStorage
+from storage.memory_storage import MemoryStorage
+
+
+def make_storage():
+    return ColumnStorage(["item_id"], FIELDS, INT_FIELDS, ("item_id", TOTAL_FIELDS))
+
+
+def test_round_trip_keeps_records_as_given():
+    storage = make_storage()
+    records = [
+        {"id": 1, "item_id": "P1", "locations": [1, 2], "total_on_hand": 5},
+        # Missing fields stay missing, None stays None.
+        {"id": 2, "item_id": None, "description": None},
+        # Integer columns holding values an int64 column can't.
+        {"id": 3, "item_id": "P1", "total_on_hand": 1.5, "total_expected": True, "total_ordered": 2 ** 70,
+         "total_allocated": ABSENT, "total_available": "7"},
+        # Fields the storage doesn't know about.
+        {"id": 4, "item_id": "P2", "extra": {"a": [1]}, "tags": ["x"]},
+    ]
+    for record in records:
+        storage.put(record["id"], json.loads(json.dumps(record)))
+    for record in records:
+        assert storage[record["id"]] == record
+        assert type(storage[record["id"]].get("total_expected")) is type(record.get("total_expected"))
+
+
+def test_mapping_interface():
+    storage = make_storage()
+    storage.put(1, {"id": 1, "item_id": "P1"})
+    storage.put(2, {"id": 2, "item_id": "P2"})
+    assert len(storage) == 2
+    assert 1 in storage and 3 not in storage
+    assert list(storage) == [1, 2]
+    assert dict(storage.items()) == {1: {"id": 1, "item_id": "P1"}, 2: {"id": 2, "item_id": "P2"}}
+    assert list(storage.values()) == [{"id": 1, "item_id": "P1"}, {"id": 2, "item_id": "P2"}]
+    assert storage.get(3) is None
+    assert storage.get(3, "default") == "default"
+    with pytest.raises(KeyError):
+        storage[3]
+
+
+def test_records_are_copies():
+    storage = make_storage()
+    storage.put(1, {"id": 1, "item_id": "P1", "locations": [1]})
+    record = storage.get(1)
+    record["item_id"] = "P2"
+    record["locations"].append(2)
+    assert storage.get(1) == {"id": 1, "item_id": "P1", "locations": [1]}
+    assert storage.find("item_id", "P2") == []
+
+
+def test_reused_rows_start_empty():
+    storage = make_storage()
+    storage.put(1, {"id": 1, "item_id": "P1", "total_on_hand": 3, "description": "a", "extra": 1})
+    storage.remove(1)
+    storage.put(2, {"id": 2})
+    assert storage.get(2) == {"id": 2}
+    assert storage.get(1) is None
+    assert storage.find("item_id", "P1") == []
+
+
+def test_matches_memory_storage():
+    rng = random.Random(7)
+    columns = make_storage()
+    memory = MemoryStorage(["item_id"])
+    for step in range(3000):
+        key = rng.randrange(200)
+        if rng.random() < 0.25:
+            if key in memory:
+                memory.remove(key)
+                columns.remove(key)
+            continue
+        record = {"id": key, "item_id": f"P{rng.randrange(20)}"}
+        for field in TOTAL_FIELDS:
+            if rng.random() < 0.9:
+                record[field] = rng.choice([rng.randrange(-50, 1000), 2.5, None])
+        if rng.random() < 0.3:
+            record["locations"] = [rng.randrange(10) for i in range(rng.randrange(4))]
+        memory.put(key, dict(record))
+        columns.put(key, dict(record))
+    assert dict(columns.items()) == dict(memory.items())
+    for n in range(20):
+        item_id = f"P{n}"
+        rows = memory.find("item_id", item_id)
+        assert sorted(columns.find("item_id", item_id), key=lambda r: r["id"]) == sorted(rows, key=lambda r: r["id"])
+        expected = []
+        for field in TOTAL_FIELDS:
+            total = 0
+            for row in rows:
+                value = row.get(field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    total += value
+            expected.append(total)
+        assert columns.sum_fields("item_id", item_id, TOTAL_FIELDS) == expected
+        assert columns.sum_fields("item_id", item_id, ["total_on_hand"]) == expected[-1:]
+
+
+def test_inventory_totals_follow_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr("storage.snapshot.ENABLED", False)
+    records = []
+    for i in range(1, 7):
+        records.append({"id": i, "item_id": f"P{i % 2}", "total_on_hand": i, "total_expected": 0, "total_ordered": i,
+                        "total_allocated": 0, "total_available": i})
+    (tmp_path / "inventories.json").write_text(json.dumps(records))
+    pool = Inventories(str(tmp_path) + "/")
+    assert pool.get_inventory_totals_for_item("P0")["total_on_hand"] == 2 + 4 + 6
+
+    # Callers change the record they got and hand it back.
+    inventory = pool.get_inventory(2)
+    inventory["total_on_hand"] += 10
+    inventory["item_id"] = "P1"
+    pool.update_inventory(2, inventory)
+    pool.remove_inventory(4)
+    pool.add_inventory({"id": 7, "item_id": "P0", "total_on_hand": 100, "total_expected": 0, "total_ordered": 0,
+                        "total_allocated": 0, "total_available": 0})
+    assert pool.get_inventory_totals_for_item("P0") == {
+        "total_expected": 0, "total_ordered": 6, "total_allocated": 0, "total_available": 6, "total_on_hand": 106}
+    assert pool.get_inventory_totals_for_item("P1")["total_on_hand"] == 1 + 3 + 5 + 12
+    assert pool.get_inventory_totals_for_item("P9")["total_on_hand"] == 0
+
+    # The journal replays to the same totals.
+    pool.save()
+    reloaded = Inventories(str(tmp_path) + "/")
+    for item_id in ["P0", "P1"]:
+        assert reloaded.get_inventory_totals_for_item(item_id) == pool.get_inventory_totals_for_item(item_id)
@@ -0,0 +1,145 @@
+import json
+import os
+
+import pytest
+
+from models.clients import Clients
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr("storage.snapshot.ENABLED", False)
+    clients = []
+    for i in range(1, 4):
+        clients.append({"id": i, "name": f"client {i}"})
+    (tmp_path / "clients.json").write_text(json.dumps(clients))
+    return str(tmp_path) + "/"
+
+
+def load(root):
+    return dict(Clients(root).data.items())
+
+
+def write(pool):
+    pool.add_client({"id": 4, "name": "client 4"})
+    pool.update_client(2, {"id": 2, "name": "renamed"})
+    pool.remove_client(3)
+    pool.save()
+
+
+def test_journal_replays_on_load(root):
+    pool = Clients(root)
+    write(pool)
+    assert os.path.exists(pool.get_journal_path())
+    assert load(root) == dict(pool.data.items())
+    assert sorted(load(root)) == [1, 2, 4]
+
+
+def test_torn_journal_tail_is_cut_off(root):
+    pool = Clients(root)
+    write(pool)
+    expected = dict(pool.data.items())
+    with open(pool.get_journal_path(), "a") as f:
+        f.write('{"op": "put", "key": 5, "rec')
+    pool = Clients(root)
+    assert dict(pool.data.items()) == expected
+    pool.add_client({"id": 6, "name": "client 6"})
+    pool.save()
+    assert sorted(load(root)) == [1, 2, 4, 6]
+
+
+def test_compaction_rewrites_the_data_file(root):
+    pool = Clients(root)
+    write(pool)
+    expected = dict(pool.data.items())
+    pool.compact()
+    assert not os.path.exists(pool.get_journal_path())
+    assert not os.path.exists(pool.get_journal_path() + ".compacting")
+    with open(pool.data_path) as f:
+        assert sorted(x["id"] for x in json.load(f)) == sorted(expected)
+    assert load(root) == expected
+
+
+def test_interrupted_compaction_with_a_newer_journal(root):
+    # The process stopped after moving the journal aside; later writes
+    # went to a fresh journal.
+    pool = Clients(root)
+    write(pool)
+    os.replace(pool.get_journal_path(), pool.get_journal_path() + ".compacting")
+    pool = Clients(root)
+    pool.update_client(4, {"id": 4, "name": "newer"})
+    pool.save()
+    expected = dict(pool.data.items())
+    assert load(root) == expected
+    pool = Clients(root)
+    pool.compact()
+    assert not os.path.exists(pool.get_journal_path())
+    assert not os.path.exists(pool.get_journal_path() + ".compacting")
+    assert load(root) == expected
+    assert expected[4]["name"] == "newer"
+
+
+def test_interrupted_compaction_without_a_journal(root):
+    # Only the .compacting file is left; compacting again must not fail
+    # looking for the journal.
+    pool = Clients(root)
+    write(pool)
+    os.replace(pool.get_journal_path(), pool.get_journal_path() + ".compacting")
+    pool = Clients(root)
+    expected = dict(pool.data.items())
+    pool.compact()
+    assert not os.path.exists(pool.get_journal_path() + ".compacting")
+    assert load(root) == expected
+
+
+def test_journal_entry_missing_its_newline_is_cut_off(root):
+    # The last entry (removing client 3) lost only its newline; it parses,
+    # but was never acknowledged, and appending after it would merge two
+    # entries into one unparseable line.
+    pool = Clients(root)
+    write(pool)
+    path = pool.get_journal_path()
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-1])
+    pool = Clients(root)
+    assert sorted(pool.data) == [1, 2, 3, 4]
+    pool.add_client({"id": 5, "name": "client 5"})
+    pool.save()
+    pool.add_client({"id": 6, "name": "client 6"})
+    pool.save()
+    clients = load(root)
+    assert sorted(clients) == [1, 2, 3, 4, 5, 6]
+    assert clients[2]["name"] == "renamed"
+
+
+def test_compaction_writes_the_records_as_they_were_when_it_started(root):
+    pool = Clients(root)
+    write(pool)
+    copy = pool.start_compaction()
+    # Writes between the two halves go to the new journal.
+    client = pool.get_client(1)
+    client["name"] = "changed meanwhile"
+    pool.update_client(1, client)
+    pool.add_client({"id": 7, "name": "client 7"})
+    pool.save()
+    pool.finish_compaction(copy)
+    with open(pool.data_path) as f:
+        compacted = {x["id"]: x for x in json.load(f)}
+    assert sorted(compacted) == [1, 2, 4]
+    assert compacted[1]["name"] == "client 1"
+    assert load(root) == dict(pool.data.items())
+
+
+def test_switching_to_sqlite_imports_the_journal(root):
+    pool = Clients(root)
+    write(pool)
+    os.replace(pool.get_journal_path(), pool.get_journal_path() + ".compacting")
+    pool = Clients(root)
+    pool.add_client({"id": 8, "name": "client 8"})
+    pool.save()
+    expected = dict(pool.data.items())
+    database = Clients(root, storage="sqlite")
+    assert dict(database.data.items()) == expected
+    assert database.get_client(2)["name"] == "renamed"
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from models.base import InvalidKey
+from models.items import Items
+from models.warehouses import Warehouses
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr("storage.snapshot.ENABLED", False)
+    (tmp_path / "warehouses.json").write_text(json.dumps([{"id": 1}, {"id": 2}]))
+    (tmp_path / "items.json").write_text(json.dumps([{"uid": "P1"}]))
+    return str(tmp_path) + "/"
+
+
+def test_keys_from_bodies_are_coerced(root):
+    warehouses = Warehouses(root)
+    warehouses.add_warehouse({"id": "7"})
+    assert warehouses.get_warehouse(7)["id"] == 7
+    assert warehouses.get_page_keys()[0] == [1, 2, 7]
+    items = Items(root)
+    items.add_item({"uid": 5})
+    assert items.get_page_keys()[0] == ["5", "P1"]
+
+
+@pytest.mark.parametrize("key", ["seven", None, True, 7.5, [7], {"id": 7}])
+def test_invalid_keys_are_rejected(root, key):
+    warehouses = Warehouses(root)
+    with pytest.raises(InvalidKey):
+        warehouses.add_warehouse({"id": key})
+    assert warehouses.get_page_keys()[0] == [1, 2]